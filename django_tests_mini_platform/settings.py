@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'tests.apps.TestsConfig',
     'crispy_forms',
     'social_django',
@@ -53,6 +54,21 @@ MIDDLEWARE = [
     'social_django.middleware.SocialAuthExceptionMiddleware',
 ]
 
+# per-view queries / timing, Server-Timing header and the staff-only
+# stats endpoint (tests:request_stats), over the last N requests per view
+REQUEST_STATS_ENABLED = os.environ.get('REQUEST_STATS', '') == '1'
+REQUEST_STATS_WINDOW = 1000
+if REQUEST_STATS_ENABLED:
+    # sync only: under ASGI it runs the whole chain in a thread
+    MIDDLEWARE.insert(0, 'tests.middleware.RequestStatsMiddleware')
+
+# RouteBudgetTests and `manage.py update_route_baseline --check`:
+# queries never grow past tests/fixtures/route_baseline.json, latency
+# (machine dependent, so opt-in) up to RATIO times plus SLACK ms
+ROUTE_LATENCY_CHECK = os.environ.get('ROUTE_LATENCY_CHECK', '') == '1'
+ROUTE_LATENCY_RATIO = float(os.environ.get('ROUTE_LATENCY_RATIO', 3))
+ROUTE_LATENCY_SLACK_MS = float(os.environ.get('ROUTE_LATENCY_SLACK_MS', 50))
+
 ROOT_URLCONF = 'django_tests_mini_platform.urls'
 
 TEMPLATES = [
@@ -91,20 +107,94 @@ WSGI_APPLICATION = 'django_tests_mini_platform.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# DB_ENGINE=sqlite is the local stand-in: no Postgres server needed,
+# search falls back to SQLite FTS5 (see tests/search.py)
+DB_ENGINE = os.environ.get('DB_ENGINE', 'postgresql')
+# seconds a connection is reused by the next requests of the same
+# worker thread, 0 opens and closes one per request. Every worker
+# thread holds one connection: workers x threads is the pool size,
+# keep it under max_connections or the pgbouncer pool
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+# ping a reused connection idle longer than this at request start,
+# so a connection dropped by the server is replaced, 0 never pings
+DB_HEALTH_CHECK_INTERVAL = int(
+    os.environ.get('DB_HEALTH_CHECK_INTERVAL', 30))
+# DB_PGBOUNCER=1 behind pgbouncer in transaction pooling mode
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', '') == '1'
+
+DATABASE_ENGINES = {
+    'postgresql': {
         'ENGINE': 'django.db.backends.postgresql_psycopg2',
-        'NAME': 'testsbase',
-        'USER': 'testsbase',
-        'PASSWORD': 'testsbase',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'testsbase'),
+        'USER': os.environ.get('DB_USER', 'testsbase'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'testsbase'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
+        # server-side cursors do not survive transaction pooling
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
         'TEST': {
             'NAME': 'testsbasetest',
         },
+    },
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+    },
+}
+
+DATABASES = {
+    'default': {
+        **DATABASE_ENGINES[DB_ENGINE],
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
     }
 }
 
+# threads (and connections) running the ORM for the async endpoints
+# of tests/async_views.py, 0 runs it in Django's single sync thread,
+# which SQLite needs anyway
+ASYNC_DB_THREADS = int(os.environ.get(
+    'ASYNC_DB_THREADS', 0 if DB_ENGINE == 'sqlite' else 20))
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# CACHE_BACKEND=file|db switches the cache to a shared backend,
+# db needs `python manage.py createcachetable`
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-mini-platform',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', BASE_DIR / 'cache'),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'tests_cache'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60
+QUESTION_BLOCKS_CACHE_TIMEOUT = 60 * 60
+# seconds a signed test attempt (tests.grading.new_attempt) can be submitted
+TEST_ATTEMPT_MAX_AGE = 24 * 60 * 60
+COMMENTS_CACHE_TIMEOUT = 60 * 60
+PROFILE_STATS_CACHE_TIMEOUT = 60 * 60
+CATALOGUE_CACHE_TIMEOUT = 10 * 60
+# item analysis on the test edit page, refreshed by
+# `python manage.py analyze_items` (run it more often than this)
+ITEM_ANALYSIS_CACHE_TIMEOUT = 24 * 60 * 60
+
 # Custom user
 
 AUTH_USER_MODEL = "tests.TestsUser"
@@ -163,6 +253,15 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+# collectstatic writes name.<hash>.ext and .gz / .br variants,
+# brotli only with the Brotli package installed
+STATICFILES_STORAGE = 'tests.storage.CompressedManifestStaticFilesStorage'
+# Cache-Control max-age in seconds of files served by tests/serve.py:
+# content-hashed static names never change, the rest is revalidated
+STATIC_HASHED_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_MAX_AGE = 60 * 60
+MEDIA_MAX_AGE = 24 * 60 * 60
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
@@ -172,10 +271,30 @@ LOGOUT_REDIRECT_URL = '/'
 
 TESTS_ORDERINGS = ['created_at', '-created_at']
 DEFAULT_TESTS_ORDERING = 'created_at'
+# keyset pagination by (ordering, id) instead of OFFSET + COUNT(*)
+TESTS_CURSOR_PAGINATION = os.environ.get(
+    'TESTS_CURSOR_PAGINATION', '') == '1'
+
+# full-text search, see tests/search.py
+TESTS_SEARCH_CONFIG = 'english'
+TESTS_SEARCH_INCLUDE_QUESTIONS = True
+TESTS_SEARCH_LIMIT = 1000
+
+TEST_COMMENTS_PAGE_SIZE = 20
+LEADERBOARD_SIZE = 20
+PROFILE_PAGE_SIZE = 20
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, "media/")
 
+# avatar renditions (tests/thumbnails.py), side in pixels,
+# about twice the size they are shown at
+AVATAR_SIZES = {'small': 96, 'profile': 300}
+AVATAR_FORMAT = 'WEBP'
+AVATAR_QUALITY = 80
+AVATAR_MAX_UPLOAD_SIZE = 2 * 1024 * 1024
+AVATAR_MAX_DIMENSION = 4096
+
 MINIMUM_QUESTIONS = 5
 
 HOME_URL_LITERAL = 'tests:tests'
@@ -19,17 +19,20 @@ from django.urls import path
 from django_tests_mini_platform import settings
 from django.conf.urls import url, include
 from django.contrib import admin
-from django.conf.urls.static import static
+
+from tests.serve import serve_file
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     url(r'^', include('tests.urls')),
     url(r'^oauth/', include('social_django.urls', namespace='social')),
+    url(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), serve_file, {
+        'document_root': settings.STATIC_ROOT,
+        'max_age': settings.STATIC_MAX_AGE,
+        'hashed_max_age': settings.STATIC_HASHED_MAX_AGE,
+    }),
+    url(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_file, {
+        'document_root': settings.MEDIA_ROOT,
+        'max_age': settings.MEDIA_MAX_AGE,
+    }),
 ]
-
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL,
-        document_root=settings.MEDIA_ROOT
-    )
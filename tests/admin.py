@@ -1,9 +1,19 @@
-from django.contrib import admin
+import io
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 
 # Register your models here.
 # from django.utils.safestring import mark_safe
 
-from .models import Test, TestsUser, PassedTests, Question, Comment
+from .models import Test, TestsUser, PassedTests, Question, Comment, \
+    TestAttempt, UserScore
+from .forms import ImportTestsForm
+from .transfer import EXPORT_FORMATS, IMPORT_READERS, TransferError, \
+    export_records, import_records
 
 
 class TestsInline(admin.StackedInline):
@@ -11,7 +21,9 @@ class TestsInline(admin.StackedInline):
     fk_name = 'tests_user'
     extra = 0
     readonly_fields = ['passed_test', 'right_answers_count',
-                       'question_count', 'pass_date_time', ]
+                       'question_count', 'pass_date_time',
+                       'attempts_count', 'best_percentage', 'score', ]
+    exclude = ['latest_attempt', ]
 
 
 @admin.register(TestsUser)
@@ -23,7 +35,73 @@ class TestsUserAdmin(admin.ModelAdmin):
     inlines = [TestsInline,]
 
 
-admin.site.register(Test)
+def export_action(file_format):
+    lines, content_type = EXPORT_FORMATS[file_format]
+
+    def export(modeladmin, request, queryset):
+        response = StreamingHttpResponse(
+            lines(export_records(queryset)), content_type=content_type)
+        response['Content-Disposition'] = \
+            f'attachment; filename="tests.{file_format}"'
+        return response
+
+    export.short_description = f'Export selected tests as {file_format}'
+    export.__name__ = f'export_{file_format}'
+    return export
+
+
+@admin.register(Test)
+class TestAdmin(admin.ModelAdmin):
+    list_display = ("title", "author", "draft", "question_count",
+                    "pass_count", "created_at")
+    actions = [export_action('ndjson'), export_action('csv')]
+    change_list_template = 'admin/tests/test/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view),
+                 name='tests_test_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """
+        Upload an NDJSON or CSV export, the tests are owned by the
+        importing user
+        """
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ImportTestsForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            stream = io.TextIOWrapper(
+                form.cleaned_data['file'], encoding='utf-8', newline='')
+            records = IMPORT_READERS[form.cleaned_data['format']](stream)
+            try:
+                tests, questions = import_records(records, request.user)
+            except (TransferError, UnicodeDecodeError) as error:
+                form.add_error('file', str(error))
+            else:
+                self.message_user(
+                    request,
+                    f'Imported {tests} tests with {questions} questions',
+                    messages.SUCCESS,
+                )
+                return HttpResponseRedirect(
+                    reverse('admin:tests_test_changelist'))
+        return TemplateResponse(request, 'admin/tests/test/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': 'Import tests',
+        })
+
+
+@admin.register(UserScore)
+class UserScoreAdmin(admin.ModelAdmin):
+    list_display = ("user", "total_score", "tests_passed", "updated_at")
+    readonly_fields = ("total_score", "tests_passed", "updated_at")
+
+
 admin.site.register(PassedTests)
 admin.site.register(Question)
 admin.site.register(Comment)
+admin.site.register(TestAttempt)
@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+
+from django_tests_mini_platform.settings import DB_HEALTH_CHECK_INTERVAL
 
 
 class TestsConfig(AppConfig):
     name = 'tests'
+
+    def ready(self):
+        # connect signal handlers
+        import tests.signals  # noqa: F401
+        from tests.db import check_connections
+
+        if DB_HEALTH_CHECK_INTERVAL:
+            request_started.connect(check_connections)
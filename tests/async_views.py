@@ -0,0 +1,128 @@
+"""
+Async submission endpoints for the ASGI server.
+The ORM is sync only in Django 3.1: database work runs in a bounded
+thread pool (ASYNC_DB_THREADS), so a burst of submissions waits on the
+event loop instead of tying up a thread each. Every pool thread keeps
+its own persistent connection, the pool size is also the number of
+connections these endpoints hold.
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import HttpResponseRedirect, HttpResponseNotAllowed, \
+    HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from django_tests_mini_platform.settings import ASYNC_DB_THREADS
+from tests.forms import CreateCommentForm
+from tests.grading import grade_submission
+from tests.models import Test
+
+DB_EXECUTOR = ThreadPoolExecutor(
+    ASYNC_DB_THREADS, thread_name_prefix='async-db'
+) if ASYNC_DB_THREADS else None
+
+
+def in_db_thread(func, *args):
+    # pool threads get no request_started / request_finished signals
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_db(func, *args):
+    """
+    Run sync ORM code in the database pool,
+    or in Django's single sync thread when the pool is off
+    """
+    if DB_EXECUTOR is None:
+        return await sync_to_async(func)(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(DB_EXECUTOR, in_db_thread, func, *args)
+
+
+def request_user(request):
+    """ authenticated user of the request or None, loads the session """
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+def save_comment(form, user, test_id):
+    comment = form.save(commit=False)
+    comment.test = get_object_or_404(Test, id=test_id)
+    comment.user = user
+    comment.save()
+    return comment
+
+
+def test_detail_redirect(test_id):
+    return HttpResponseRedirect(
+        reverse('tests:test_detail', kwargs={'pk': test_id}))
+
+
+async def test_check(request):
+    """
+    Async TestCheckView: grade the test form and store the result
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    user = await run_db(request_user, request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+
+    test_id = request.POST.get('test_id')
+    await run_db(grade_submission, user, test_id, request.POST.dict())
+    return test_detail_redirect(test_id)
+
+
+async def comment_create(request):
+    """
+    Async CommentCreateView
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    user = await run_db(request_user, request)
+    if user is None:
+        return redirect_to_login(request.get_full_path())
+
+    form = CreateCommentForm(request.POST)
+    if not form.is_valid():
+        return HttpResponseBadRequest('Invalid comment')
+    test_id = request.POST.get('test_id')
+    await run_db(save_comment, form, user, test_id)
+    return test_detail_redirect(test_id)
+
+
+async def api_test_check(request, pk):
+    """
+    JSON submission: {"answers": {"<question id>": <answer number>},
+    "attempt": "<token of the pass page, optional>"}
+    answers {"right", "total", "percentage"}
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    user = await run_db(request_user, request)
+    if user is None:
+        return JsonResponse({'error': 'authentication required'}, status=401)
+
+    try:
+        data = json.loads(request.body)
+        answers = {str(k): str(v) for k, v in data['answers'].items()}
+        # the attempt token of the test pass page, if any
+        answers['attempt'] = str(data.get('attempt') or '')
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'error': 'invalid answers'}, status=400)
+
+    right, total = await run_db(grade_submission, user, pk, answers)
+    return JsonResponse({
+        'right': right,
+        'total': total,
+        'percentage': round(right / total * 100, 2),
+    })
@@ -0,0 +1,86 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+
+class CacheStats:
+    """
+    Hit / miss counters of one cache namespace (per process)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    @property
+    def ratio(self):
+        total = self.hits + self.misses
+        return round(self.hits / total, 4) if total else 0.0
+
+    def as_dict(self):
+        return {'hits': self.hits, 'misses': self.misses, 'ratio': self.ratio}
+
+
+CACHE_STATS = {}
+
+
+def get_stats(name):
+    return CACHE_STATS.setdefault(name, CacheStats(name))
+
+
+def cache_stats():
+    """
+    {namespace: {'hits': .., 'misses': .., 'ratio': ..}}
+    """
+    return {name: stats.as_dict() for name, stats in CACHE_STATS.items()}
+
+
+def version_key(namespace, obj_id):
+    return f'{namespace}:version:{obj_id}'
+
+
+def get_version(namespace, obj_id):
+    """
+    Current version of a cached object.
+    A missing version starts from the clock, not from 1,
+    so keys cached before an eviction are never reused.
+    """
+    return cache.get_or_set(
+        version_key(namespace, obj_id), time.time_ns(), None)
+
+
+def bump_version(namespace, obj_id):
+    """
+    Invalidate every key built on the previous version
+    """
+    key = version_key(namespace, obj_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def cached(name, key, build, timeout):
+    """
+    Value of build() cached under key, counted in the name stats
+    """
+    stats = get_stats(name)
+    value = cache.get(key)
+    if value is None:
+        stats.miss()
+        value = build()
+        cache.set(key, value, timeout)
+    else:
+        stats.hit()
+    return value
@@ -0,0 +1,42 @@
+"""
+Rendered tests catalogue pages, shared by all users.
+The cache covers the rows and the pagination of a page,
+so a hit skips both the page queries and the rendering.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django_tests_mini_platform.settings import CATALOGUE_CACHE_TIMEOUT
+from tests.cache import cached, get_version
+
+# one version for the whole catalogue, bumped by tests.signals
+CATALOGUE_VERSION = 'catalogue'
+CATALOGUE_ID = 'all'
+# GET params a shared page depends on
+CATALOGUE_PARAMS = ('q', 'ordering', 'page', 'cursor')
+
+
+def is_shared(params):
+    """ the per-user passed / unmatched filter is never cached """
+    return params.get('passed', 'all') == 'all'
+
+
+def catalogue_key(params, cursor_pagination):
+    query = urlencode(sorted(
+        (name, params[name]) for name in CATALOGUE_PARAMS if name in params))
+    digest = hashlib.md5(
+        f'{cursor_pagination}?{query}'.encode()).hexdigest()
+    version = get_version(CATALOGUE_VERSION, CATALOGUE_ID)
+    return f'catalogue:{version}:{digest}'
+
+
+def cached_catalogue(params, cursor_pagination, render):
+    """
+    render() of the page under the current catalogue version
+    """
+    return cached(
+        'catalogue',
+        catalogue_key(params, cursor_pagination),
+        render,
+        CATALOGUE_CACHE_TIMEOUT,
+    )
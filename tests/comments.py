@@ -0,0 +1,53 @@
+from django.utils import timezone
+from django.utils.formats import date_format
+
+from django_tests_mini_platform.settings import TEST_COMMENTS_PAGE_SIZE, \
+    COMMENTS_CACHE_TIMEOUT
+from tests.cache import cached, get_version
+from tests.models import Comment
+from tests.pagination import CursorPaginator
+from tests.thumbnails import avatar_url
+
+# version of a test comments thread, bumped by tests.signals
+COMMENTS_VERSION = 'comments'
+
+
+def serialize_comment(comment):
+    """
+    Plain dict used by both test_detail.html and the JSON feed
+    """
+    return {
+        'id': comment.id,
+        'text': comment.text,
+        'created_at': date_format(
+            timezone.localtime(comment.created_at), 'DATETIME_FORMAT'),
+        'user_full_name': comment.user.full_name,
+        'user_avatar': avatar_url(str(comment.user.avatar)),
+    }
+
+
+def comment_page(test_id, cursor=None):
+    """
+    One page of a test comments, oldest first, keyed by (created_at, id)
+    """
+    comments = Comment.objects.filter(test_id=test_id).select_related('user')
+    paginator = CursorPaginator(
+        comments, TEST_COMMENTS_PAGE_SIZE, 'created_at')
+    page = paginator.page(cursor)
+    return {
+        'comments': [serialize_comment(comment) for comment in page],
+        'next': page.next_cursor,
+    }
+
+
+def first_comment_page(test_id):
+    """
+    First page from the cache, rebuilt after every new or deleted comment
+    """
+    version = get_version(COMMENTS_VERSION, test_id)
+    return cached(
+        'comments_first_page',
+        f'comments_first_page:{test_id}:{version}',
+        lambda: comment_page(test_id),
+        COMMENTS_CACHE_TIMEOUT,
+    )
@@ -0,0 +1,25 @@
+"""
+Health checks of persistent database connections
+"""
+import time
+
+from django.db import connections
+
+from django_tests_mini_platform.settings import DB_HEALTH_CHECK_INTERVAL
+
+
+def check_connections(**kwargs):
+    """
+    request_started receiver: closes reused connections that were idle
+    longer than DB_HEALTH_CHECK_INTERVAL and no longer answer, so the
+    request opens a fresh one instead of failing on its first query.
+    Django only gets CONN_HEALTH_CHECKS in 4.1.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        idle = now - getattr(connection, 'last_request_at', now)
+        connection.last_request_at = now
+        if idle > DB_HEALTH_CHECK_INTERVAL and not connection.is_usable():
+            connection.close()
@@ -84,3 +84,23 @@ class TestPassForm(forms.Form):
 class SearchBoxForm(forms.Form):
     q = forms.CharField()
 
+
+class ImportTestsForm(forms.Form):
+    file = forms.FileField(help_text='NDJSON (.ndjson, .jsonl) or CSV')
+    format = forms.ChoiceField(
+        choices=[('', 'From the file extension'),
+                 ('ndjson', 'NDJSON'), ('csv', 'CSV')],
+        required=False,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        if upload and not cleaned_data.get('format'):
+            extension = upload.name.rsplit('.', 1)[-1].lower()
+            extension = 'ndjson' if extension == 'jsonl' else extension
+            if extension not in ('ndjson', 'csv'):
+                raise forms.ValidationError(
+                    'Unknown file extension, choose the format')
+            cleaned_data['format'] = extension
+        return cleaned_data
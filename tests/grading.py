@@ -0,0 +1,283 @@
+import random
+import secrets
+import struct
+
+from django.core import signing
+from django.core.exceptions import SuspiciousOperation
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.http import Http404
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest
+
+from django_tests_mini_platform.settings import ANSWER_KEY_CACHE_TIMEOUT, \
+    QUESTION_BLOCKS_CACHE_TIMEOUT, TEST_ATTEMPT_MAX_AGE
+from tests.cache import cached, get_version, bump_version
+from tests.leaderboards import record_score
+from tests.models import Question, PassedTests, Test, TestAttempt
+from tests.profiles import PROFILE_VERSION
+
+# version of a test questions set, bumped by tests.signals
+QUESTIONS_VERSION = 'questions'
+OPTIONS_PLACEHOLDER = '<!--options-->'
+ATTEMPT_SALT = 'tests.attempt'
+ANSWER_VALUES = [choice.value for choice in Question.RightAnswer]
+
+
+def load_answer_key(test_id):
+    """
+    {question id: right answer} for the whole test, in one query
+    """
+    return dict(
+        Question.objects.filter(test_id=test_id)
+        .order_by()
+        .values_list('id', 'right_answer')
+    )
+
+
+def get_answer_key(test_id):
+    """
+    Answer key from the cache, keyed by test id and questions version
+    """
+    version = get_version(QUESTIONS_VERSION, test_id)
+    return cached(
+        'answer_key',
+        f'answer_key:{test_id}:{version}',
+        lambda: load_answer_key(test_id),
+        ANSWER_KEY_CACHE_TIMEOUT,
+    )
+
+
+def render_question_block(question):
+    """
+    (head, [option of answer 1..4], tail) of one question,
+    options are joined in the order of the attempt
+    """
+    head, tail = render_to_string('test_pass_question.html', {
+        'question': question,
+        'options': mark_safe(OPTIONS_PLACEHOLDER),
+    }).split(OPTIONS_PLACEHOLDER)
+    options = [
+        render_to_string('test_pass_option.html', {
+            'question': question, 'value': value, 'answer': answer})
+        for value, answer in enumerate(question.answers, start=1)
+    ]
+    return head, options, tail
+
+
+def render_question_blocks(test_id):
+    """
+    {question id: (head, options, tail)} of the test pass form
+    """
+    return {
+        question.id: render_question_block(question)
+        for question in Question.objects.filter(test_id=test_id)
+    }
+
+
+def get_question_blocks(test_id):
+    """
+    Question blocks from the cache, the same for every user
+    until the questions change
+    """
+    version = get_version(QUESTIONS_VERSION, test_id)
+    return cached(
+        'question_blocks',
+        f'question_blocks:{test_id}:{version}',
+        lambda: render_question_blocks(test_id),
+        QUESTION_BLOCKS_CACHE_TIMEOUT,
+    )
+
+
+def attempt_order(question_ids, pool_size, seed):
+    """
+    [(question id, order of the answer values)] of one attempt:
+    pool_size questions drawn from the sorted ids and their answers
+    shuffled, by one PRNG seeded with the attempt seed
+    """
+    rand = random.Random(seed)
+    question_ids = sorted(question_ids)
+    count = min(pool_size or len(question_ids), len(question_ids))
+    return [
+        (question_id, rand.sample(ANSWER_VALUES, len(ANSWER_VALUES)))
+        for question_id in rand.sample(question_ids, count)
+    ]
+
+
+def new_attempt(test):
+    """
+    (signed attempt token, attempt order) for the test pass page.
+    The token carries the seed and the pool size to the check.
+    """
+    seed = secrets.randbits(63)
+    token = signing.dumps(
+        {'test': test.id, 'seed': seed, 'pool': test.pool_size},
+        salt=ATTEMPT_SALT,
+    )
+    return token, attempt_order(get_answer_key(test.id), test.pool_size, seed)
+
+
+def read_attempt(token, test_id):
+    """
+    (seed, pool size) of a submitted attempt token
+    """
+    try:
+        attempt = signing.loads(
+            token, salt=ATTEMPT_SALT, max_age=TEST_ATTEMPT_MAX_AGE)
+    except signing.BadSignature:
+        raise SuspiciousOperation('tampered or expired test attempt')
+    if attempt['test'] != test_id:
+        raise SuspiciousOperation('attempt of another test')
+    return attempt['seed'], attempt['pool']
+
+
+def attempt_blocks(test_id, order):
+    """
+    Rendered questions of the attempt, options in the attempt order
+    """
+    blocks = get_question_blocks(test_id)
+    rendered = []
+    for question_id, values in order:
+        if question_id not in blocks:
+            # edited since the answer key was cached
+            continue
+        head, options, tail = blocks[question_id]
+        rendered.append(mark_safe(
+            head + ''.join(options[value - 1] for value in values) + tail))
+    return rendered
+
+
+def parse_answers(post_data):
+    """
+    Pick {question id: answer} pairs out of the submitted form
+    """
+    return {
+        int(k): int(v) for k, v in post_data.items()
+        if k.isdigit() and v.isdigit()
+    }
+
+
+def grade(answer_key, answers):
+    """
+    Count right answers in memory.
+    Answers to questions of another test are rejected.
+    """
+    foreign = answers.keys() - answer_key.keys()
+    if foreign:
+        raise SuspiciousOperation(
+            f'answers to questions {sorted(foreign)} of another test')
+    return sum(1 for k, v in answers.items() if answer_key[k] == v)
+
+
+def pack_responses(question_ids, answers):
+    """
+    (question ids, chosen answers) of an attempt as two byte strings:
+    little-endian uint32 ids and one byte per answer, 0 unanswered
+    """
+    return (
+        struct.pack(f'<{len(question_ids)}I', *question_ids),
+        bytes(
+            answers[question_id]
+            if answers.get(question_id) in ANSWER_VALUES else 0
+            for question_id in question_ids
+        ),
+    )
+
+
+def save_result(user, test_id, right_answers_count, question_count,
+                seed=None, responses=None):
+    """
+    Append the attempt to the history (one INSERT),
+    move the user result to it (one UPDATE, INSERT on the first pass)
+    and apply the score change to the leaderboards, in one transaction
+    holding the user result row.
+    The cached profile is invalidated last, so a profile read
+    in between cannot cache the old stats under the new version.
+    """
+    question_ids, answers = responses or (None, None)
+    score = PassedTests(
+        right_answers_count=right_answers_count,
+        question_count=question_count,
+    ).apply_score().score
+    result = PassedTests.objects.filter(
+        tests_user=user,
+        passed_test_id=test_id
+    )
+    with transaction.atomic():
+        attempt = TestAttempt.objects.create(
+            tests_user=user,
+            passed_test_id=test_id,
+            right_answers_count=right_answers_count,
+            question_count=question_count,
+            seed=seed,
+            question_ids=question_ids,
+            answers=answers,
+        )
+        percentage = attempt.percentage
+        update = dict(
+            right_answers_count=right_answers_count,
+            question_count=question_count,
+            pass_date_time=attempt.created_at,
+            latest_attempt=attempt,
+            attempts_count=F('attempts_count') + 1,
+            score=score,
+            best_percentage=Greatest(
+                'best_percentage',
+                Value(percentage, output_field=FloatField())
+            ),
+        )
+        previous = result.select_for_update() \
+            .values_list('score', flat=True).first()
+        if previous is None:
+            try:
+                with transaction.atomic():
+                    PassedTests.objects.create(
+                        tests_user=user,
+                        passed_test_id=test_id,
+                        right_answers_count=right_answers_count,
+                        question_count=question_count,
+                        pass_date_time=attempt.created_at,
+                        latest_attempt=attempt,
+                        best_percentage=percentage,
+                    )
+            except IntegrityError:
+                # a concurrent first pass won the insert
+                previous = result.select_for_update() \
+                    .values_list('score', flat=True).get()
+        if previous is not None:
+            # a first pass is recorded by the post_save signal
+            result.update(**update)
+            record_score(user.id, previous, score, attempt.created_at)
+    bump_version(PROFILE_VERSION, user.id)
+    return attempt
+
+
+def grade_submission(user, test_id, post_data):
+    """
+    Grade a submitted test form and store the result.
+    Without an attempt token every question of the test counts,
+    tests drawing a pool of questions require the token.
+    """
+    if not str(test_id).isdigit():
+        raise Http404('No test found')
+    answer_key = get_answer_key(int(test_id))
+    if not answer_key:
+        raise Http404('No test found')
+
+    seed = None
+    if post_data.get('attempt'):
+        # grade only the questions drawn for this attempt
+        seed, pool_size = read_attempt(post_data['attempt'], int(test_id))
+        answer_key = {
+            question_id: answer_key[question_id] for question_id, _
+            in attempt_order(answer_key, pool_size, seed)
+        }
+    elif Test.objects.filter(id=test_id, pool_size__isnull=False).exists():
+        raise SuspiciousOperation('no attempt token for a test with a pool')
+
+    answers = parse_answers(post_data)
+    right_answers_count = grade(answer_key, answers)
+    save_result(user, test_id, right_answers_count, len(answer_key), seed,
+                pack_responses(list(answer_key), answers))
+    return right_answers_count, len(answer_key)
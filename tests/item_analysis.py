@@ -0,0 +1,146 @@
+"""
+Item analysis of a test from the packed attempt responses:
+difficulty (share of right answers), discrimination index
+(difficulty in the upper minus the lower group of attempts)
+and the frequency of every answer, computed with NumPy over
+flat response arrays, no per-answer rows or Python loops.
+"""
+import numpy as np
+from django.core.cache import cache
+
+from django_tests_mini_platform.settings import ITEM_ANALYSIS_CACHE_TIMEOUT
+from tests.cache import get_stats, get_version
+from tests.grading import QUESTIONS_VERSION, ANSWER_VALUES
+from tests.models import Question, TestAttempt
+
+ID_DTYPE = np.dtype('<u4')
+# share of the best and of the worst attempts compared
+GROUP_SHARE = 0.27
+# answer values and 0 for unanswered
+CHOICES = len(ANSWER_VALUES) + 1
+
+
+def load_responses(test_id):
+    """
+    (attempt index, question id, chosen answer) of every stored
+    response of the test as three flat arrays, decoded in one
+    np.frombuffer call per column over the joined packed bytes
+    """
+    packed = list(TestAttempt.objects.filter(
+        passed_test_id=test_id, answers__isnull=False
+    ).order_by().values_list('question_ids', 'answers'))
+    if not packed:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, empty
+    packed_ids, packed_answers = zip(*packed)
+    ids = np.frombuffer(b''.join(packed_ids), dtype=ID_DTYPE)
+    answers = np.frombuffer(b''.join(packed_answers), dtype=np.uint8)
+    # one byte per answer: the answer lengths are the response counts
+    rows = np.repeat(np.arange(len(packed)),
+                     [len(row) for row in packed_answers])
+    return rows, ids, answers
+
+
+def ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return numerator / denominator
+
+
+def group_difficulty(mask, columns, correct, questions):
+    return ratio(
+        np.bincount(columns[mask], weights=correct[mask],
+                    minlength=questions),
+        np.bincount(columns[mask], minlength=questions),
+    )
+
+
+def as_number(value):
+    return None if np.isnan(value) else round(float(value), 3)
+
+
+def build_item_analysis(test_id):
+    """
+    {'attempts': .., 'questions': [{'id', 'text', 'right_answer',
+    'asked', 'difficulty', 'discrimination', 'answers', 'unanswered'}]},
+    numbers are None where there are no responses to compare
+    """
+    questions = list(
+        Question.objects.filter(test_id=test_id).order_by('id')
+        .values('id', 'text', 'right_answer')
+    )
+    question_ids = np.array([q['id'] for q in questions], dtype=ID_DTYPE)
+    key = np.array([q['right_answer'] for q in questions], dtype=np.uint8)
+
+    rows, ids, answers = load_responses(test_id)
+    # responses to deleted questions do not count
+    known = np.isin(ids, question_ids)
+    rows, ids, answers = rows[known], ids[known], answers[known]
+    columns = np.searchsorted(question_ids, ids)
+    correct = answers == key[columns]
+    count = len(questions)
+
+    asked = np.bincount(columns, minlength=count)
+    difficulty = ratio(np.bincount(columns, weights=correct,
+                                   minlength=count), asked)
+    # choices[q, v]: responses to question q with answer v, 0 unanswered
+    choices = np.bincount(columns * CHOICES + answers,
+                          minlength=count * CHOICES).reshape(count, CHOICES)
+    frequencies = ratio(choices, asked[:, np.newaxis])
+
+    # attempts ranked by their share of right answers
+    attempts = np.unique(rows)
+    totals = ratio(np.bincount(rows, weights=correct),
+                   np.bincount(rows))[attempts]
+    ranked = attempts[np.argsort(totals, kind='stable')]
+    if len(ranked) >= 2:
+        group_size = max(1, int(round(len(ranked) * GROUP_SHARE)))
+        discrimination = (
+            group_difficulty(np.isin(rows, ranked[-group_size:]),
+                             columns, correct, count)
+            - group_difficulty(np.isin(rows, ranked[:group_size]),
+                               columns, correct, count)
+        )
+    else:
+        discrimination = np.full(count, np.nan)
+
+    return {
+        'attempts': len(attempts),
+        'questions': [
+            dict(
+                question,
+                asked=int(asked[i]),
+                difficulty=as_number(difficulty[i]),
+                discrimination=as_number(discrimination[i]),
+                answers=[as_number(value) for value in frequencies[i, 1:]],
+                unanswered=as_number(frequencies[i, 0]),
+            )
+            for i, question in enumerate(questions)
+        ],
+    }
+
+
+def item_analysis_key(test_id):
+    version = get_version(QUESTIONS_VERSION, test_id)
+    return f'item_analysis:{test_id}:{version}'
+
+
+def item_analysis(test_id):
+    """
+    Item analysis cached by `manage.py analyze_items`, None until
+    the test is analysed: the edit page never runs the analysis.
+    New attempts show up after the next refresh.
+    """
+    analysis = cache.get(item_analysis_key(test_id))
+    stats = get_stats('item_analysis')
+    if analysis is None:
+        stats.miss()
+    else:
+        stats.hit()
+    return analysis
+
+
+def refresh_item_analysis(test_id):
+    analysis = build_item_analysis(test_id)
+    cache.set(item_analysis_key(test_id), analysis,
+              ITEM_ANALYSIS_CACHE_TIMEOUT)
+    return analysis
@@ -0,0 +1,112 @@
+"""
+Per-test and global leaderboards.
+Every submission applies the change of the user result to the stored
+scores (PassedTests.score, UserScore): lists are read in index order
+and a rank counts the entries ahead of the user in the same index,
+nothing is sorted or recomputed per request.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+
+from django_tests_mini_platform.settings import LEADERBOARD_SIZE
+from tests.models import PassedTests, UserScore
+from tests.profiles import score
+
+TEST_ORDERING = ('-score', 'pass_date_time')
+GLOBAL_ORDERING = ('-total_score', 'updated_at')
+
+
+def test_leaderboard(test_id, limit=LEADERBOARD_SIZE):
+    """ latest results of a test, best first, in the index order """
+    return PassedTests.objects.filter(passed_test_id=test_id) \
+        .select_related('tests_user') \
+        .order_by(*TEST_ORDERING)[:limit]
+
+
+def global_leaderboard(limit=LEADERBOARD_SIZE):
+    return UserScore.objects.select_related('user') \
+        .order_by(*GLOBAL_ORDERING)[:limit]
+
+
+def ahead(score_field, date_field, value, date):
+    """ entries listed before (value, date) in a (-score, date) order """
+    return Q(**{f'{score_field}__gt': value}) \
+        | Q(**{score_field: value, f'{date_field}__lt': date})
+
+
+def test_rank(user_id, test_id):
+    """
+    1-based place of the user on the test leaderboard or None,
+    the same order as test_leaderboard: a range count over
+    passed_test_leaderboard_idx
+    """
+    result = PassedTests.objects.filter(
+        tests_user_id=user_id, passed_test_id=test_id
+    ).values_list('score', 'pass_date_time').first()
+    if result is None:
+        return None
+    return PassedTests.objects.filter(
+        ahead('score', 'pass_date_time', *result),
+        passed_test_id=test_id,
+    ).count() + 1
+
+
+def global_rank(user_id):
+    """ the same over user_score_rank_idx """
+    entry = UserScore.objects.filter(user_id=user_id) \
+        .values_list('total_score', 'updated_at').first()
+    if entry is None:
+        return None
+    return UserScore.objects.filter(
+        ahead('total_score', 'updated_at', *entry)).count() + 1
+
+
+def record_score(user_id, old_score, new_score, passed_at=None):
+    """
+    Apply a changed test result to the global leaderboard: old_score
+    None for a first pass, new_score None for a deleted result.
+    Only the user row changes, by the difference, in one UPDATE.
+    """
+    entry = UserScore.objects.filter(user_id=user_id)
+    passed = (old_score is None) - (new_score is None)
+    if passed < 0 and not entry.filter(tests_passed__gt=1).exists():
+        # the last result is gone, so is the user from the board
+        entry.delete()
+        return
+
+    update = {
+        'total_score': F('total_score') + (new_score or 0) - (old_score or 0),
+        'tests_passed': F('tests_passed') + passed,
+    }
+    if passed_at is not None:
+        update['updated_at'] = passed_at
+    if entry.update(**update) or new_score is None:
+        return
+    try:
+        with transaction.atomic():
+            UserScore.objects.create(
+                user_id=user_id, total_score=new_score,
+                tests_passed=1, updated_at=passed_at)
+    except IntegrityError:
+        # a concurrent first pass won the insert
+        entry.update(**update)
+
+
+def rebuild_leaderboards(batch_size=1000):
+    """
+    Recompute every stored score from the results.
+    Returns (results, users) rebuilt.
+    """
+    with transaction.atomic():
+        results = PassedTests.objects.update(score=score())
+        UserScore.objects.all().delete()
+        totals = PassedTests.objects.order_by().values('tests_user_id') \
+            .annotate(total_score=Sum('score'), tests_passed=Count('id'),
+                      updated_at=Max('pass_date_time'))
+        UserScore.objects.bulk_create(
+            (UserScore(user_id=row.pop('tests_user_id'), **row)
+             for row in totals.iterator()),
+            batch_size=batch_size,
+        )
+        users = UserScore.objects.count()
+    return results, users
@@ -0,0 +1,124 @@
+"""
+In-process load driver: replays the main user flows through the
+Django test Client and collects latency and query counts per view.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tests.grading import load_answer_key
+from tests.metrics import percentile_summary
+from tests.models import Test, TestsUser
+from tests.views import TestsView
+
+
+def local_client():
+    """ test Client that passes ALLOWED_HOSTS of the current settings """
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+    host = hosts[0].lstrip('.') if hosts else 'testserver'
+    return Client(HTTP_HOST=host)
+
+
+class LoadDriver:
+    """
+    Replays list, search, detail, pass, check and comment requests
+    of random users against random (popular-first) published tests
+    """
+    FLOWS = ['list', 'search', 'detail', 'pass', 'check', 'comment']
+
+    def __init__(self, users, tests, seed=0, writes=True):
+        self.random = random.Random(seed)
+        self.users = list(users)
+        self.tests = list(tests)
+        self.writes = writes
+        self.client = local_client()
+        self.answer_keys = {}
+        self.latency = {}
+        self.queries = {}
+
+    @classmethod
+    def from_database(cls, users=50, tests=200, **kwargs):
+        """ latest registered users and most passed published tests """
+        return cls(
+            TestsUser.objects.order_by('-id')[:users],
+            Test.objects.filter(draft=False)
+            .order_by('-pass_count').values_list('id', flat=True)[:tests],
+            **kwargs
+        )
+
+    def run(self, requests):
+        flows = [flow for flow in self.FLOWS
+                 if self.writes or flow not in ('check', 'comment')]
+        for _ in range(requests):
+            self.client.force_login(self.random.choice(self.users))
+            flow = self.random.choice(flows)
+            getattr(self, f'flow_{flow}')()
+        return self.report()
+
+    def request(self, name, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, data or {})
+            elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name}: {url} {response.status_code}')
+        self.latency.setdefault(name, []).append(elapsed)
+        self.queries.setdefault(name, []).append(len(queries))
+        return response
+
+    def pick_test(self):
+        # the tests list is popular first, favour its head
+        index = int(len(self.tests) * self.random.random() ** 3)
+        return self.tests[index]
+
+    def flow_list(self):
+        ordering = self.random.choice(['created_at', '-created_at'])
+        pages = max(1, min(3, len(self.tests) // TestsView.paginate_by))
+        self.request('list', 'get', reverse('tests:tests'), {
+            'ordering': ordering,
+            'page': self.random.randint(1, pages),
+        })
+
+    def flow_search(self):
+        word = self.random.choice(['test', 'math', 'synthetic', 'question'])
+        self.request('search', 'get', reverse('tests:tests'), {'q': word})
+
+    def flow_detail(self):
+        self.request('detail', 'get', reverse(
+            'tests:test_detail', kwargs={'pk': self.pick_test()}))
+
+    def flow_pass(self):
+        self.request('pass', 'get', reverse(
+            'tests:test_pass', kwargs={'pk': self.pick_test()}))
+
+    def flow_check(self):
+        test_id = self.pick_test()
+        if test_id not in self.answer_keys:
+            self.answer_keys[test_id] = load_answer_key(test_id)
+        answers = {
+            str(question_id): self.random.choice([right, 1, 2, 3, 4])
+            for question_id, right in self.answer_keys[test_id].items()
+        }
+        self.request('check', 'post', reverse('tests:test_check'),
+                     {'test_id': test_id, **answers})
+
+    def flow_comment(self):
+        self.request('comment', 'post', reverse('tests:comment'),
+                     {'test_id': self.pick_test(), 'text': 'load test'})
+
+    def report(self):
+        """
+        {view: {'latency': percentiles in ms, 'queries': percentiles}}
+        """
+        return {
+            name: {
+                'latency': percentile_summary(samples),
+                'queries': percentile_summary(self.queries[name]),
+            }
+            for name, samples in sorted(self.latency.items())
+        }
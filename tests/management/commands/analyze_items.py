@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from tests.item_analysis import refresh_item_analysis
+from tests.models import TestAttempt
+
+
+class Command(BaseCommand):
+    help = 'Compute difficulty, discrimination and answer frequencies ' \
+           'of test questions from the stored responses and cache them ' \
+           'for the test edit page'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--test',
+            type=int,
+            action='append',
+            help='Test id, repeatable (default: every test with responses)',
+        )
+
+    def handle(self, *args, **options):
+        test_ids = options['test'] or TestAttempt.objects \
+            .filter(answers__isnull=False).order_by() \
+            .values_list('passed_test_id', flat=True).distinct()
+        analysed = 0
+        for test_id in test_ids:
+            refresh_item_analysis(test_id)
+            analysed += 1
+        self.stdout.write(self.style.SUCCESS(f'Analysed {analysed} tests'))
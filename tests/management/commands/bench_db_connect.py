@@ -0,0 +1,95 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, close_old_connections
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+
+from tests.loadtest import local_client
+from tests.models import TestsUser
+
+
+class Command(BaseCommand):
+    help = 'Measure the cost of opening a database connection per request ' \
+           'against reusing persistent connections (CONN_MAX_AGE).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests per CONN_MAX_AGE value',
+        )
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            nargs='+',
+            default=[0, 60],
+            help='CONN_MAX_AGE values to compare',
+        )
+        parser.add_argument(
+            '--url',
+            default=reverse('tests:tests'),
+            help='Page requested, by a logged in user',
+        )
+
+    def handle(self, *args, **options):
+        user = TestsUser.objects.filter(is_active=True).first()
+        if user is None:
+            self.stderr.write('No users, run seed_platform first')
+            return
+        client = local_client()
+        client.force_login(user)
+
+        self.stdout.write(
+            f'{connection.vendor}: connect '
+            f'{self.connect_ms(options["requests"]):.2f} ms')
+        self.stdout.write(
+            f'{"max age":>8} {"connects":>9} {"p50 ms":>8} {"mean ms":>8}')
+        for max_age in options['max_age']:
+            connects, samples = self.run(
+                client, options['url'], options['requests'], max_age)
+            self.stdout.write(
+                f'{max_age:>8} {connects:>9} '
+                f'{statistics.median(samples):>8.2f} '
+                f'{statistics.mean(samples):>8.2f}')
+
+    @staticmethod
+    def connect_ms(repeat):
+        """ median ms to open a connection and run the first query """
+        samples = []
+        for _ in range(repeat):
+            connection.close()
+            start = time.perf_counter()
+            connection.ensure_connection()
+            connection.cursor().execute('SELECT 1')
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    @staticmethod
+    def run(client, url, requests, max_age):
+        """
+        Connections opened and ms per request. The test Client skips
+        close_old_connections, so it runs here around every request
+        the way the WSGI handler does.
+        """
+        connects = []
+
+        def count(**kwargs):
+            connects.append(1)
+
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        connection_created.connect(count)
+        samples = []
+        try:
+            for _ in range(requests):
+                start = time.perf_counter()
+                close_old_connections()
+                client.get(url)
+                close_old_connections()
+                samples.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection_created.disconnect(count)
+        return len(connects), samples
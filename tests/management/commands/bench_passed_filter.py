@@ -0,0 +1,88 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from django_tests_mini_platform.settings import MINIMUM_QUESTIONS
+from tests.models import Test, TestsUser, PassedTests
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the passed / unmatched tests list filters ' \
+           'against the number of passes per user. ' \
+           'Works in a transaction that is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--passes',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000, 5000],
+            help='Numbers of passed tests per user to measure',
+        )
+        parser.add_argument(
+            '--tests',
+            type=int,
+            default=10000,
+            help='Published tests in the catalogue',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Runs per measurement, the median is reported',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        author = TestsUser.objects.create(username='bench_passed_author')
+        # published needs the questions count, the draft rule
+        # would keep them all out of the measured list otherwise
+        Test.objects.bulk_create(
+            Test(title=f'bench {i}', author=author, draft=False,
+                 question_count=MINIMUM_QUESTIONS)
+            for i in range(options['tests'])
+        )
+        test_ids = list(Test.objects.filter(author=author)
+                        .order_by('id').values_list('id', flat=True))
+
+        self.stdout.write(
+            f'{"passes":>8} {"NOT IN ms":>10} {"NOT EXISTS ms":>14} '
+            f'{"IN ms":>8} {"EXISTS ms":>10}')
+        for passes in options['passes']:
+            user = TestsUser.objects.create(username=f'bench_passed_{passes}')
+            PassedTests.objects.bulk_create(
+                PassedTests(tests_user=user, passed_test_id=test_id,
+                            right_answers_count=1, question_count=1)
+                for test_id in test_ids[:passes]
+            )
+            published = Test.objects.filter(draft=False).order_by(
+                '-created_at')
+            timings = [
+                self.measure(published.filter(
+                    ~Q(users_who_passed_test=user)), options['repeat']),
+                self.measure(published.unmatched_by(user), options['repeat']),
+                self.measure(published.filter(
+                    users_who_passed_test=user), options['repeat']),
+                self.measure(published.passed_by(user), options['repeat']),
+            ]
+            self.stdout.write(
+                f'{passes:>8} {timings[0]:>10.2f} {timings[1]:>14.2f} '
+                f'{timings[2]:>8.2f} {timings[3]:>10.2f}')
+
+    @staticmethod
+    def measure(queryset, repeat):
+        """ median ms of one list page, the way TestsView loads it """
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset.count()
+            list(queryset[:15])
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
@@ -0,0 +1,140 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.urls import reverse
+
+from django_tests_mini_platform.settings import ASYNC_DB_THREADS
+from tests.grading import load_answer_key
+from tests.loadtest import local_client
+from tests.metrics import percentile_summary
+from tests.models import Test, TestsUser
+
+FORM = 'application/x-www-form-urlencoded'
+
+
+class Command(BaseCommand):
+    help = 'Burst of test submissions: the sync view served by a pool ' \
+           'of WSGI-style threads against the async view on one event ' \
+           'loop (ASGI). Writes real attempts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Submissions per run',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=20,
+            help='Worker threads of the WSGI run',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1000,
+            help='Submissions in flight at once in the ASGI run',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+        )
+
+    def handle(self, *args, **options):
+        user = TestsUser.objects.filter(is_active=True).first()
+        tests = list(Test.objects.filter(draft=False)
+                     .values_list('id', flat=True)[:50])
+        if user is None or not tests:
+            self.stderr.write('No data, run seed_platform first')
+            return
+        rand = random.Random(options['seed'])
+        submissions = [
+            self.submission(rand, test_id, load_answer_key(test_id))
+            for test_id in (rand.choice(tests)
+                            for _ in range(options['requests']))
+        ]
+
+        self.stdout.write(
+            f'{"server":>6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"errors":>7}')
+        self.report('wsgi', *self.run_wsgi(
+            user, submissions, options['threads']))
+        self.report('asgi', *self.run_asgi(
+            user, submissions, options['concurrency']))
+        self.stdout.write(f'ASGI database threads: {ASYNC_DB_THREADS}')
+
+    @staticmethod
+    def submission(rand, test_id, answer_key):
+        # urlencoded body, AsyncClient of Django 3.1 mangles multipart
+        return urlencode({
+            'test_id': test_id,
+            **{str(question_id): rand.choice([right, 1, 2, 3, 4])
+               for question_id, right in answer_key.items()},
+        })
+
+    def report(self, server, elapsed, samples, errors):
+        summary = percentile_summary(samples)
+        self.stdout.write(
+            f'{server:>6} {len(samples) / elapsed:>8.1f} '
+            f'{summary["p50"]:>8.2f} {summary["p95"]:>8.2f} {errors:>7}')
+
+    @staticmethod
+    def run_wsgi(user, submissions, threads):
+        url = reverse('tests:test_check')
+        local = threading.local()
+        errors = []
+
+        def submit(data):
+            if not hasattr(local, 'client'):
+                local.client = local_client()
+                local.client.force_login(user)
+            start = time.perf_counter()
+            try:
+                status = local.client.post(
+                    url, data, content_type=FORM).status_code
+            except Exception:
+                status = 500
+            if status != 302:
+                errors.append(status)
+            return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            samples = list(pool.map(submit, submissions))
+        return time.perf_counter() - start, samples, len(errors)
+
+    @staticmethod
+    def run_asgi(user, submissions, concurrency):
+        url = reverse('tests:test_check_async')
+        client = AsyncClient(HTTP_HOST=local_client().defaults['HTTP_HOST'])
+        client.force_login(user)
+        errors = []
+
+        async def submit(data, limit):
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    status = (await client.post(
+                        url, data, content_type=FORM)).status_code
+                except Exception:
+                    status = 500
+                if status != 302:
+                    errors.append(status)
+                return (time.perf_counter() - start) * 1000
+
+        async def burst():
+            limit = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(
+                *(submit(data, limit) for data in submissions))
+
+        start = time.perf_counter()
+        samples = asyncio.run(burst())
+        return time.perf_counter() - start, samples, len(errors)
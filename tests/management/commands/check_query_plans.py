@@ -0,0 +1,81 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from tests.models import Test, TestsUser, Question, Comment, PassedTests
+from tests.views import TestsView, MyTestsView
+
+SEQ_SCAN = {
+    # PostgreSQL: "Seq Scan on tests_test"
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    # SQLite: "SCAN tests_test" / "SCAN TABLE tests_test", but not
+    # "SCAN tests_test USING INDEX ..." which walks an index in order
+    'sqlite': re.compile(r'SCAN (?:TABLE )?(\w+)(?! USING)(?!\w)'),
+}
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot view queries and fail ' \
+           'if any of them falls back to a sequential scan'
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'{connection.vendor} is not supported')
+
+        flagged = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # small tables are cheaper to scan, we want to know
+                # whether a usable index exists at all
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in self.hot_queries():
+                plan = queryset.explain()
+                scans = pattern.findall(plan)
+                if scans:
+                    flagged.append(name)
+                    self.stdout.write(self.style.ERROR(
+                        f'SEQ SCAN {name}: {", ".join(sorted(set(scans)))}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'ok       {name}'))
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan + '\n')
+
+        if flagged:
+            raise CommandError(
+                f'{len(flagged)} hot queries fall back to a seq scan')
+
+    def hot_queries(self):
+        """
+        (name, queryset) pairs built the way the views build them
+        """
+        user = TestsUser.objects.order_by('id').first() \
+            or TestsUser(id=0, username='')
+        test_id = Test.objects.values_list('id', flat=True).first() or 0
+
+        def list_queryset(view_class, **params):
+            request = RequestFactory().get('/', params)
+            request.user = user
+            view = view_class()
+            view.setup(request)
+            return view.get_queryset()[:view.paginate_by]
+
+        return [
+            ('tests list, old first', list_queryset(TestsView)),
+            ('tests list, new first',
+             list_queryset(TestsView, ordering='-created_at')),
+            ('tests list, unmatched',
+             list_queryset(TestsView, passed='unmatched')),
+            ('tests list, passed', list_queryset(TestsView, passed='passed')),
+            ('my tests', list_queryset(MyTestsView)),
+            ('test questions', Question.objects.filter(test_id=test_id)),
+            ('test comments', Comment.objects.filter(test_id=test_id)),
+            ('user test result', PassedTests.objects.filter(
+                tests_user=user, passed_test_id=test_id)),
+            ('user profile results',
+             PassedTests.objects.filter(tests_user=user)),
+        ]
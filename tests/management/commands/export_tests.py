@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from tests.models import Test
+from tests.transfer import EXPORT_FORMATS, export_records
+
+
+class Command(BaseCommand):
+    help = 'Stream tests with their questions as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=sorted(EXPORT_FORMATS),
+            default='ndjson',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write, stdout by default',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per server-side cursor round trip',
+        )
+        parser.add_argument(
+            '--author',
+            help='Only tests of this username',
+        )
+        parser.add_argument(
+            '--published',
+            action='store_true',
+            help='Only published (not draft) tests',
+        )
+
+    def handle(self, *args, **options):
+        tests = Test.objects.all()
+        if options['author']:
+            tests = tests.filter(author__username=options['author'])
+        if options['published']:
+            tests = tests.filter(draft=False)
+
+        lines, _ = EXPORT_FORMATS[options['format']]
+        records = export_records(tests, options['chunk_size'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as output:
+                output.writelines(lines(records))
+        else:
+            sys.stdout.writelines(lines(records))
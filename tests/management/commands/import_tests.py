@@ -0,0 +1,56 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tests.models import TestsUser
+from tests.transfer import IMPORT_READERS, TransferError, import_records
+
+
+class Command(BaseCommand):
+    help = 'Load tests with their questions from NDJSON or CSV ' \
+           'in bulk_create batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--author',
+            required=True,
+            help='Username that will own the imported tests',
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(IMPORT_READERS),
+            help='By default taken from the file extension',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Tests created per transaction',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] \
+            or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format == 'jsonl':
+            file_format = 'ndjson'
+        if file_format not in IMPORT_READERS:
+            raise CommandError(f'unknown format of {path}, use --format')
+
+        try:
+            author = TestsUser.objects.get(username=options['author'])
+        except TestsUser.DoesNotExist:
+            raise CommandError(f'no user {options["author"]}')
+
+        with open(path, encoding='utf-8', newline='') as stream:
+            records = IMPORT_READERS[file_format](stream)
+            try:
+                tests, questions = import_records(
+                    records, author, options['batch_size'])
+            except TransferError as error:
+                raise CommandError(
+                    f'{error} (the batches before it were imported)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {tests} tests with {questions} questions'))
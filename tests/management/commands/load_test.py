@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tests.loadtest import LoadDriver
+
+
+class Command(BaseCommand):
+    help = 'Replay list / search / detail / pass / check / comment ' \
+           'requests in process and report latency and queries per view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=50,
+                            help='Users the requests are spread over')
+        parser.add_argument('--tests', type=int, default=200,
+                            help='Most passed tests the requests target')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--read-only', action='store_true',
+                            help='Skip the check and comment flows')
+        parser.add_argument('--keep', action='store_true',
+                            help='Commit the written passes and comments')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        driver = LoadDriver.from_database(
+            users=options['users'],
+            tests=options['tests'],
+            seed=options['seed'],
+            writes=not options['read_only'],
+        )
+        if not driver.users or not driver.tests:
+            raise CommandError('no users or published tests, '
+                               'run seed_platform first')
+
+        with transaction.atomic():
+            report = driver.run(options['requests'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f'{"view":<10}{"count":>7}{"p50 ms":>9}{"p95 ms":>9}'
+            f'{"p99 ms":>9}{"queries p50":>13}{"queries max":>13}')
+        for name, stats in report.items():
+            latency, queries = stats['latency'], stats['queries']
+            self.stdout.write(
+                f'{name:<10}{latency["count"]:>7}{latency["p50"]:>9}'
+                f'{latency["p95"]:>9}{latency["p99"]:>9}'
+                f'{queries["p50"]:>13}{queries["max"]:>13}')
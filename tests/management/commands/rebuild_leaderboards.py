@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from tests.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Recompute PassedTests.score and the global UserScore ' \
+           'leaderboard from the stored results'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='UserScore rows per INSERT',
+        )
+
+    def handle(self, *args, **options):
+        results, users = rebuild_leaderboards(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {results} test scores and {users} user scores'))
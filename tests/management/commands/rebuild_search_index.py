@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from tests.models import Test
+from tests.search import index_tests
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents of all tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Tests reindexed per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Test.objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(ids), batch_size):
+            index_tests(ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {len(ids)} tests'))
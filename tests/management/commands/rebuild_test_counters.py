@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Q, F
+from django.db.models.functions import Coalesce
+
+from django_tests_mini_platform.settings import MINIMUM_QUESTIONS
+from tests.cache import bump_version
+from tests.catalogue import CATALOGUE_VERSION, CATALOGUE_ID
+from tests.models import Test, Question, PassedTests
+
+
+def count_of(model, fk_name):
+    """ Correlated COUNT(*) of model rows pointing to the outer test """
+    rows = model.objects.filter(**{fk_name: OuterRef('pk')}) \
+        .order_by().values(fk_name).annotate(total=Count('pk'))
+    return Coalesce(Subquery(rows.values('total')), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recount Test.question_count and Test.pass_count ' \
+           'for tests whose stored counters drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drifted tests, do not fix them',
+        )
+
+    def handle(self, *args, **options):
+        drifted = Test.objects.annotate(
+            real_question_count=count_of(Question, 'test'),
+            real_pass_count=count_of(PassedTests, 'passed_test'),
+        ).filter(
+            ~Q(question_count=F('real_question_count'))
+            | ~Q(pass_count=F('real_pass_count'))
+        ).values_list('id', 'real_question_count')
+        drifted = dict(drifted)
+        drifted_ids = list(drifted)
+
+        if not options['dry_run'] and drifted_ids:
+            short_ids = [test_id for test_id, count in drifted.items()
+                         if count < MINIMUM_QUESTIONS]
+            with transaction.atomic():
+                # keep published_test_has_questions satisfied
+                Test.objects.filter(id__in=short_ids).update(draft=True)
+                Test.objects.filter(id__in=drifted_ids).update(
+                    question_count=count_of(Question, 'test'),
+                    pass_count=count_of(PassedTests, 'passed_test'),
+                )
+            bump_version(CATALOGUE_VERSION, CATALOGUE_ID)
+
+        verb = 'Found' if options['dry_run'] else 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(drifted_ids)} drifted test counters'))
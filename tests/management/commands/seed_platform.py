@@ -0,0 +1,178 @@
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from tests.grading import ANSWER_VALUES, pack_responses
+from tests.models import TestsUser, Test, Question, PassedTests, \
+    TestAttempt, Comment
+
+
+def zipf_weights(count, exponent):
+    """ cumulative Zipf weights: item of rank r is picked ~ 1 / r^s """
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, tests, questions, passes and ' \
+           'comments with Zipf-skewed popularity, using bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--tests', type=int, default=500)
+        parser.add_argument('--questions', type=int, default=10,
+                            help='Questions per test')
+        parser.add_argument('--passes', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Zipf exponent of tests popularity')
+        parser.add_argument('--prefix', default='seed',
+                            help='Prefix of generated usernames and titles, '
+                                 'must not be used by an earlier run')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed, runs are reproducible')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        with transaction.atomic():
+            # generated rows are read back by the prefix,
+            # rows of an earlier run would be picked up
+            if self.users(prefix).exists() or self.tests(prefix).exists():
+                raise CommandError(
+                    f'Prefix "{prefix}" is already seeded, '
+                    f'pass another --prefix')
+            users = self.create_users(prefix, options['users'])
+            tests = self.create_tests(
+                prefix, users, options['tests'], options['questions'])
+            weights = zipf_weights(len(tests), options['zipf'])
+            self.create_passes(users, tests, weights, options['passes'])
+            self.create_comments(users, tests, weights, options['comments'])
+
+        call_command('rebuild_test_counters', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        call_command('rebuild_leaderboards', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users, {len(tests)} tests'))
+
+    def users(self, prefix):
+        return TestsUser.objects.filter(
+            username__startswith=f'{prefix}_user_')
+
+    def tests(self, prefix):
+        return Test.objects.filter(title__startswith=f'{prefix} test ')
+
+    def create_users(self, prefix, count):
+        password = make_password(None)
+        TestsUser.objects.bulk_create(
+            (TestsUser(username=f'{prefix}_user_{i}', password=password,
+                       first_name='User', last_name=str(i))
+             for i in range(count)),
+            batch_size=self.batch_size,
+        )
+        # ids are read back, bulk_create does not return them everywhere
+        return list(self.users(prefix).values_list('id', flat=True))
+
+    def create_tests(self, prefix, users, count, questions):
+        Test.objects.bulk_create(
+            (Test(title=f'{prefix} test {i}',
+                  description=f'synthetic test number {i}',
+                  author_id=self.random.choice(users),
+                  draft=False,
+                  question_count=questions)
+             for i in range(count)),
+            batch_size=self.batch_size,
+        )
+        tests = list(self.tests(prefix).values_list('id', flat=True))
+        Question.objects.bulk_create(
+            (Question(test_id=test_id,
+                      text=f'question {i} of test {test_id}',
+                      answer_one='one', answer_two='two',
+                      answer_three='three', answer_four='four',
+                      right_answer=self.random.randint(1, 4))
+             for test_id in tests for i in range(questions)),
+            batch_size=self.batch_size,
+        )
+        return tests
+
+    def responses(self, questions, right):
+        """
+        Packed responses of an attempt with right right answers,
+        the other questions answered wrong or left blank
+        """
+        chosen = set(self.random.sample(range(len(questions)), right))
+        answers = {}
+        for i, (question_id, right_answer) in enumerate(questions):
+            if i in chosen:
+                answers[question_id] = right_answer
+            else:
+                answers[question_id] = self.random.choice(
+                    [0] + [value for value in ANSWER_VALUES
+                           if value != right_answer])
+        return pack_responses([q for q, _ in questions], answers)
+
+    def create_passes(self, users, tests, weights, count):
+        pairs = set()
+        for _ in range(count):
+            test_id = self.random.choices(tests, cum_weights=weights)[0]
+            pairs.add((self.random.choice(users), test_id))
+
+        questions = {}
+        for test_id, question_id, right_answer in Question.objects.filter(
+                test_id__in=tests).order_by('test_id', 'id').values_list(
+                'test_id', 'id', 'right_answer'):
+            questions.setdefault(test_id, []).append(
+                (question_id, right_answer))
+        results = [
+            (user_id, test_id, len(questions[test_id]),
+             self.random.randint(0, len(questions[test_id])))
+            for user_id, test_id in pairs
+        ]
+        now = timezone.now()
+        TestAttempt.objects.bulk_create(
+            (TestAttempt(tests_user_id=user_id, passed_test_id=test_id,
+                         right_answers_count=right, question_count=total,
+                         created_at=now, question_ids=question_ids,
+                         answers=answers)
+             for user_id, test_id, total, right in results
+             for question_ids, answers in [
+                 self.responses(questions[test_id], right)]),
+            batch_size=self.batch_size,
+        )
+        PassedTests.objects.bulk_create(
+            (PassedTests(tests_user_id=user_id, passed_test_id=test_id,
+                         right_answers_count=right, question_count=total,
+                         pass_date_time=now,
+                         best_percentage=round(right * 100 / total, 2),
+                         score=right * 100 / total)
+             for user_id, test_id, total, right in results),
+            batch_size=self.batch_size,
+        )
+        # one attempt per result, ids are not returned everywhere
+        PassedTests.objects.filter(
+            passed_test_id__in=tests, latest_attempt=None
+        ).update(latest_attempt=Subquery(
+            TestAttempt.objects.filter(
+                tests_user_id=OuterRef('tests_user_id'),
+                passed_test_id=OuterRef('passed_test_id'),
+            ).order_by('-id').values('id')[:1]
+        ))
+
+    def create_comments(self, users, tests, weights, count):
+        pick = self.random.choices
+        Comment.objects.bulk_create(
+            (Comment(test_id=pick(tests, cum_weights=weights)[0],
+                     user_id=self.random.choice(users),
+                     text=f'synthetic comment {i}')
+             for i in range(count)),
+            batch_size=self.batch_size,
+        )
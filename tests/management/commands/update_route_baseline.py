@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import Client, override_settings
+from django.test.runner import DiscoverRunner
+
+from tests.routes import BASELINE, create_route_dataset, measure_routes, \
+    over_budget, read_baseline, write_baseline
+
+# the real cache could serve entries of the real database ids
+ROUTE_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'route-baseline',
+}}
+
+
+class Command(BaseCommand):
+    help = 'Measure the queries and latency of every named route in ' \
+           'a throwaway test database and rewrite the baseline of ' \
+           'RouteBudgetTests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report changed routes, do not write the baseline',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Fail on routes over their query or latency budget, '
+                 'do not write the baseline',
+        )
+
+    def handle(self, *args, **options):
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases(aliases={DEFAULT_DB_ALIAS})
+        try:
+            # inside a transaction like TestCase: atomic blocks of the
+            # views run as savepoints, on_commit hooks never fire
+            with override_settings(CACHES=ROUTE_CACHES), \
+                    transaction.atomic():
+                results = measure_routes(Client(), create_route_dataset())
+                transaction.set_rollback(True)
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        failed = [name for name, (_, _, status) in results.items()
+                  if status >= 400]
+        if failed:
+            raise CommandError(f'Routes failed: {", ".join(failed)}')
+
+        baseline = read_baseline() if BASELINE.exists() else {}
+        if options['check']:
+            errors = [error for name, (queries, ms, _) in results.items()
+                      for error in over_budget(name, queries, ms, baseline,
+                                               check_latency=True)]
+            if errors:
+                raise CommandError('\n'.join(errors))
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(results)} routes within the baseline'))
+            return
+
+        for name, (queries, ms, _) in results.items():
+            old = baseline.get(name, {})
+            self.stdout.write(
+                f'{name}: {old.get("queries")} -> {queries} queries, '
+                f'{old.get("ms")} -> {ms:.2f} ms')
+
+        if options['dry_run']:
+            return
+        write_baseline(results)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(results)} routes to {BASELINE}'))
@@ -0,0 +1,101 @@
+"""
+In-process request metrics collected by RequestStatsMiddleware
+"""
+import statistics
+import threading
+from collections import deque
+
+from django_tests_mini_platform.settings import REQUEST_STATS_WINDOW
+
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+
+def percentile_summary(samples):
+    """
+    {'count', 'p50', 'p95', 'p99', 'max'} of a list of numbers
+    """
+    if not samples:
+        return {'count': 0, 'p50': 0, 'p95': 0, 'p99': 0, 'max': 0}
+    if len(samples) == 1:
+        cuts = list(samples) * 99
+    else:
+        cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {
+        'count': len(samples),
+        'p50': round(cuts[49], 2),
+        'p95': round(cuts[94], 2),
+        'p99': round(cuts[98], 2),
+        'max': round(max(samples), 2),
+    }
+
+
+def histogram(samples, buckets=LATENCY_BUCKETS_MS):
+    """ {'<=5': n, ..., '>2500': n} """
+    counts = {f'<={bucket}': 0 for bucket in buckets}
+    counts[f'>{buckets[-1]}'] = 0
+    for sample in samples:
+        for bucket in buckets:
+            if sample <= bucket:
+                counts[f'<={bucket}'] += 1
+                break
+        else:
+            counts[f'>{buckets[-1]}'] += 1
+    return counts
+
+
+class ViewStats:
+    """
+    Rolling window of the last requests of one view
+    """
+
+    def __init__(self, window):
+        self.requests = 0
+        self.samples = deque(maxlen=window)
+
+    def add(self, sample):
+        self.requests += 1
+        self.samples.append(sample)
+
+    def column(self, name):
+        return [sample[name] for sample in self.samples]
+
+    def summary(self):
+        total = self.column('total_ms')
+        worst = max(self.samples, key=lambda sample: sample['repeated'])
+        return {
+            'requests': self.requests,
+            'total_ms': percentile_summary(total),
+            'db_ms': percentile_summary(self.column('db_ms')),
+            'template_ms': percentile_summary(self.column('template_ms')),
+            'queries': percentile_summary(self.column('queries')),
+            'repeated_queries': percentile_summary(self.column('repeated')),
+            'worst_repeated_sql': worst['repeated_sql'],
+            'histogram_ms': histogram(total),
+        }
+
+
+class RequestStats:
+
+    def __init__(self, window=REQUEST_STATS_WINDOW):
+        self.window = window
+        self.views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view_name, sample):
+        with self._lock:
+            stats = self.views.get(view_name)
+            if stats is None:
+                stats = self.views[view_name] = ViewStats(self.window)
+            stats.add(sample)
+
+    def summary(self):
+        with self._lock:
+            return {name: stats.summary()
+                    for name, stats in sorted(self.views.items())}
+
+    def reset(self):
+        with self._lock:
+            self.views = {}
+
+
+REQUEST_STATS = RequestStats()
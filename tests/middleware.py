@@ -0,0 +1,128 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.db import connection
+from django.template.base import Template
+
+from tests.metrics import REQUEST_STATS
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper counting queries and their time.
+    The same SQL run again with other parameters is the N+1 signature.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def repeated(self):
+        """ queries beyond the first run of every distinct statement """
+        return self.count - len(self.statements)
+
+    @property
+    def most_repeated(self):
+        if not self.statements:
+            return ''
+        sql, count = self.statements.most_common(1)[0]
+        return sql if count > 1 else ''
+
+
+class TemplateRecorder:
+    """
+    Time spent in Template.render, for TemplateResponse and
+    render_to_string alike. Includes render inside their parent
+    template and are counted once.
+    """
+
+    def __init__(self):
+        self.duration = 0.0
+        self.depth = 0
+
+    def __call__(self, render, template, context):
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            return render(template, context)
+        finally:
+            self.depth -= 1
+            if not self.depth:
+                self.duration += time.perf_counter() - start
+
+
+# recorder of the current request, None outside RequestStatsMiddleware
+TEMPLATE_RECORDER = ContextVar('template_recorder', default=None)
+
+
+def install_template_timer():
+    """ Route Template.render through the current TemplateRecorder """
+    if getattr(Template.render, 'timed', False):
+        return
+    render = Template.render
+
+    def timed_render(self, context):
+        recorder = TEMPLATE_RECORDER.get()
+        if recorder is None:
+            return render(self, context)
+        return recorder(render, self, context)
+
+    timed_render.timed = True
+    Template.render = timed_render
+
+
+class RequestStatsMiddleware:
+    """
+    Opt-in (REQUEST_STATS=1 adds it to MIDDLEWARE) per-view
+    instrumentation: query count, repeated queries, DB time, template
+    render time and total latency. Adds a Server-Timing header and
+    feeds the staff stats endpoint.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_template_timer()
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        templates = TemplateRecorder()
+        token = TEMPLATE_RECORDER.set(templates)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            TEMPLATE_RECORDER.reset(token)
+        total = time.perf_counter() - start
+
+        sample = {
+            'total_ms': total * 1000,
+            'db_ms': recorder.duration * 1000,
+            'template_ms': templates.duration * 1000,
+            'queries': recorder.count,
+            'repeated': recorder.repeated,
+            'repeated_sql': recorder.most_repeated,
+        }
+        match = request.resolver_match
+        REQUEST_STATS.record(
+            match.view_name if match else 'unresolved', sample)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={sample["db_ms"]:.2f};desc="{recorder.count} queries, '
+            f'{recorder.repeated} repeated"',
+            f'tpl;dur={sample["template_ms"]:.2f}',
+            f'total;dur={sample["total_ms"]:.2f}',
+        ])
+        return response
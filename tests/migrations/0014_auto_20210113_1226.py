@@ -135,7 +135,10 @@ def create_tests(apps, schema_editor):
     Test = apps.get_model('tests', 'Test')
     Question = apps.get_model('tests', 'Question')
     User = apps.get_model('tests', 'TestsUser')
-    author = User.objects.get(id=1)
+    author = User.objects.filter(id=1).first()
+    if author is None:
+        # a fresh database (e.g. the test runner) has no user to own them
+        return
     for item in tests_data:
         test = Test.objects.get_or_create(
             title=item.get('title'),
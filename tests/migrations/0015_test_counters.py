@@ -0,0 +1,42 @@
+# Generated by Django 3.1.4 on 2021-01-20 12:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Test = apps.get_model('tests', 'Test')
+    Question = apps.get_model('tests', 'Question')
+    PassedTests = apps.get_model('tests', 'PassedTests')
+
+    def count_of(model, fk_name):
+        rows = model.objects.filter(**{fk_name: OuterRef('pk')}) \
+            .order_by().values(fk_name).annotate(total=Count('pk'))
+        return Coalesce(Subquery(rows.values('total')), 0)
+
+    Test.objects.update(
+        question_count=count_of(Question, 'test'),
+        pass_count=count_of(PassedTests, 'passed_test'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0014_auto_20210113_1226'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='pass_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
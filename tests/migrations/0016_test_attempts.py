@@ -0,0 +1,97 @@
+# Generated by Django 3.1.4 on 2021-01-20 12:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+BATCH_SIZE = 1000
+
+
+def percentage(right_answers_count, question_count):
+    # legacy results may have no questions
+    if not question_count:
+        return 0
+    return round(right_answers_count * 100 / question_count, 2)
+
+
+def seed_attempts(apps, schema_editor):
+    """
+    Every stored result becomes the first attempt of its history,
+    written in bulk_create / bulk_update batches
+    """
+    PassedTests = apps.get_model('tests', 'PassedTests')
+    TestAttempt = apps.get_model('tests', 'TestAttempt')
+    records = PassedTests.objects.filter(latest_attempt=None).order_by('id')
+    attempt_ids = TestAttempt.objects.order_by('id') \
+        .values_list('id', flat=True)
+    last_id = 0
+    while True:
+        batch = list(records.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        # bulk_create returns no ids on every backend: the attempts
+        # of the batch are the rows after the last existing one,
+        # in the batch order, so duplicate results get their own
+        last_attempt_id = attempt_ids.last() or 0
+        TestAttempt.objects.bulk_create(
+            TestAttempt(
+                tests_user_id=record.tests_user_id,
+                passed_test_id=record.passed_test_id,
+                right_answers_count=record.right_answers_count,
+                question_count=record.question_count,
+                created_at=record.pass_date_time,
+            )
+            for record in batch
+        )
+        new_ids = attempt_ids.filter(id__gt=last_attempt_id)
+        for record, attempt_id in zip(batch, new_ids):
+            record.latest_attempt_id = attempt_id
+            record.best_percentage = percentage(
+                record.right_answers_count, record.question_count)
+        PassedTests.objects.bulk_update(
+            batch, ['latest_attempt', 'best_percentage'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0015_test_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passedtests',
+            name='attempts_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='passedtests',
+            name='best_percentage',
+            field=models.FloatField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TestAttempt',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('right_answers_count', models.PositiveIntegerField()),
+                ('question_count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('passed_test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='tests.test')),
+                ('tests_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Test attempt',
+                'verbose_name_plural': 'Test attempts',
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='passedtests',
+            name='latest_attempt',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tests.testattempt'),
+        ),
+        migrations.RunPython(seed_attempts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 3.1.4 on 2021-01-20 12:15
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+POSTGRESQL_FORWARDS = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS tests_test_search_vector_gin '
+    'ON tests_test USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS tests_test_title_trgm '
+    'ON tests_test USING gin (title gin_trgm_ops)',
+]
+POSTGRESQL_BACKWARDS = [
+    'DROP INDEX IF EXISTS tests_test_title_trgm',
+    'DROP INDEX IF EXISTS tests_test_search_vector_gin',
+]
+POSTGRESQL_FILL = """
+UPDATE tests_test SET search_vector =
+    setweight(to_tsvector(%s::regconfig, title), 'A')
+    || setweight(to_tsvector(%s::regconfig, description), 'B')
+    || setweight(to_tsvector(%s::regconfig, coalesce(
+        (SELECT string_agg(q.text, ' ') FROM tests_question q
+         WHERE q.test_id = tests_test.id AND %s), ''
+    )), 'C')
+"""
+
+SQLITE_FORWARDS = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS tests_test_fts '
+    'USING fts5(title, description, questions, '
+    'tokenize = \'porter unicode61\')',
+]
+SQLITE_BACKWARDS = [
+    'DROP TABLE IF EXISTS tests_test_fts',
+]
+SQLITE_FILL = """
+INSERT INTO tests_test_fts (rowid, title, description, questions)
+SELECT t.id, t.title, t.description, coalesce(
+    (SELECT group_concat(q.text, ' ') FROM tests_question q
+     WHERE q.test_id = t.id AND %s), ''
+) FROM tests_test t
+"""
+
+
+def create_search_structures(apps, schema_editor):
+    """
+    GIN / trigram indexes on PostgreSQL, FTS5 table on SQLite
+    """
+    vendor = schema_editor.connection.vendor
+    config = settings.TESTS_SEARCH_CONFIG
+    questions = settings.TESTS_SEARCH_INCLUDE_QUESTIONS
+    if vendor == 'postgresql':
+        for statement in POSTGRESQL_FORWARDS:
+            schema_editor.execute(statement)
+        schema_editor.execute(
+            POSTGRESQL_FILL, [config, config, config, questions])
+    elif vendor == 'sqlite':
+        for statement in SQLITE_FORWARDS:
+            schema_editor.execute(statement)
+        schema_editor.execute(SQLITE_FILL, [questions])
+
+
+def drop_search_structures(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {
+        'postgresql': POSTGRESQL_BACKWARDS,
+        'sqlite': SQLITE_BACKWARDS,
+    }.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0016_test_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            create_search_structures,
+            drop_search_structures,
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 3.1.4 on 2021-01-20 12:18
+
+from django.db import migrations, models
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, \
+    Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+BATCH_SIZE = 1000
+
+PERCENTAGE = Case(
+    # legacy attempts may have no questions
+    When(question_count=0, then=Value(0.0)),
+    default=ExpressionWrapper(
+        Cast('right_answers_count', FloatField()) * 100
+        / F('question_count'),
+        output_field=FloatField(),
+    ),
+    output_field=FloatField(),
+)
+
+
+def recount_attempts(apps, test_ids):
+    """
+    attempts_count and best_percentage of the results of the tests
+    from the attempt history, the dropped duplicates included
+    """
+    PassedTests = apps.get_model('tests', 'PassedTests')
+    TestAttempt = apps.get_model('tests', 'TestAttempt')
+    history = TestAttempt.objects.filter(passed_test__in=test_ids) \
+        .order_by().values('tests_user', 'passed_test') \
+        .annotate(attempts=Count('id'), best=Max(PERCENTAGE))
+    stats = {(row['tests_user'], row['passed_test']): row
+             for row in history}
+    results = list(PassedTests.objects.filter(passed_test__in=test_ids))
+    for result in results:
+        row = stats.get((result.tests_user_id, result.passed_test_id))
+        if row is not None:
+            result.attempts_count = row['attempts']
+            result.best_percentage = round(row['best'], 2)
+    PassedTests.objects.bulk_update(
+        results, ['attempts_count', 'best_percentage'],
+        batch_size=BATCH_SIZE)
+
+
+def drop_duplicates(apps, schema_editor):
+    """
+    Keep only the latest result of every (user, test) pair,
+    recount its attempts and the pass_count of the tests
+    that had duplicates
+    """
+    PassedTests = apps.get_model('tests', 'PassedTests')
+    Test = apps.get_model('tests', 'Test')
+    pairs = PassedTests.objects.order_by() \
+        .values('tests_user', 'passed_test')
+    duplicated = list(
+        pairs.annotate(results=Count('id')).filter(results__gt=1)
+        .values_list('passed_test', flat=True).distinct()
+    )
+    if not duplicated:
+        return
+    latest = pairs.annotate(latest=Max('id')).values('latest')
+    PassedTests.objects.exclude(id__in=latest).delete()
+    recount_attempts(apps, duplicated)
+
+    passes = PassedTests.objects.filter(passed_test=OuterRef('pk')) \
+        .order_by().values('passed_test').annotate(total=Count('pk'))
+    Test.objects.filter(id__in=duplicated).update(
+        pass_count=Coalesce(Subquery(passes.values('total')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0017_test_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='passedtests',
+            constraint=models.UniqueConstraint(fields=('tests_user', 'passed_test'), name='unique_user_passed_test'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.4 on 2021-01-20 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0018_passedtests_unique'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='question',
+            options={'ordering': ['test_id', 'text'], 'verbose_name': 'Question', 'verbose_name_plural': 'Questions'},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['test', 'created_at'], name='comment_test_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['test', 'text'], name='question_test_text_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['draft', 'created_at'], name='test_draft_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(condition=models.Q(draft=False), fields=['created_at', 'id'], name='test_published_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['author', 'created_at'], name='test_author_created_idx'),
+        ),
+    ]
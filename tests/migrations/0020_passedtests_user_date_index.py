@@ -0,0 +1,17 @@
+# Generated by Django 3.1.4 on 2021-01-20 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0019_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='passedtests',
+            index=models.Index(fields=['tests_user', 'pass_date_time'], name='passed_user_date_idx'),
+        ),
+    ]
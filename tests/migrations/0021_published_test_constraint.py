@@ -0,0 +1,26 @@
+# Generated by Django 3.1.4 on 2021-01-20 12:24
+
+from django.db import migrations, models
+
+
+def unpublish_short_tests(apps, schema_editor):
+    """
+    Published tests below the minimum would violate the new constraint
+    """
+    Test = apps.get_model('tests', 'Test')
+    Test.objects.filter(draft=False, question_count__lt=5).update(draft=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0020_passedtests_user_date_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(unpublish_short_tests, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='test',
+            constraint=models.CheckConstraint(check=models.Q(('draft', True), ('question_count__gte', 5), _connector='OR'), name='published_test_has_questions'),
+        ),
+    ]
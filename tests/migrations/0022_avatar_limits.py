@@ -0,0 +1,19 @@
+# Generated by Django 3.1.4 on 2021-01-20 12:00
+
+from django.db import migrations, models
+import tests.thumbnails
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0021_published_test_constraint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='testsuser',
+            name='avatar',
+            field=models.ImageField(blank=True, default='default_avatar.png', null=True, upload_to='avatars', validators=[tests.thumbnails.validate_avatar], verbose_name='avatar'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.4 on 2021-01-20 12:00
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0022_avatar_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='pool_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Questions drawn at random for every attempt, empty for all of them', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
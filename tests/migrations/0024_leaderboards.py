@@ -0,0 +1,65 @@
+# Generated by Django 3.1.4 on 2021-01-20 12:00
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, FloatField, Max, Sum, \
+    Value, When
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_scores(apps, schema_editor):
+    """
+    Test scores from the stored results, global scores summed from them
+    """
+    PassedTests = apps.get_model('tests', 'PassedTests')
+    UserScore = apps.get_model('tests', 'UserScore')
+    PassedTests.objects.update(score=Case(
+        # legacy results may have no questions
+        When(question_count=0, then=Value(0.0)),
+        default=F('right_answers_count') * 100.0 / F('question_count'),
+        output_field=FloatField(),
+    ))
+    totals = PassedTests.objects.order_by().values('tests_user_id') \
+        .annotate(total_score=Sum('score'), tests_passed=Count('id'),
+                  updated_at=Max('pass_date_time'))
+    UserScore.objects.bulk_create(
+        UserScore(user_id=row.pop('tests_user_id'), **row)
+        for row in totals.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0023_question_pools'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserScore',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='global_score', serialize=False, to='tests.testsuser')),
+                ('total_score', models.FloatField(default=0)),
+                ('tests_passed', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'User score',
+                'verbose_name_plural': 'User scores',
+            },
+        ),
+        migrations.AddField(
+            model_name='passedtests',
+            name='score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='passedtests',
+            index=models.Index(fields=['passed_test', '-score', 'pass_date_time'], name='passed_test_leaderboard_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userscore',
+            index=models.Index(fields=['-total_score', 'updated_at'], name='user_score_rank_idx'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.4 on 2021-01-22 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0024_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='answers',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='question_ids',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
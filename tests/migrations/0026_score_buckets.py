@@ -0,0 +1,64 @@
+# Generated by Django 3.1.4 on 2021-01-24 12:00
+
+import math
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_buckets(apps, schema_editor):
+    """
+    Per-point counts of the stored test and global scores,
+    the same as tests.leaderboards.rebuild_leaderboards builds
+    """
+    PassedTests = apps.get_model('tests', 'PassedTests')
+    UserScore = apps.get_model('tests', 'UserScore')
+    ScoreBucket = apps.get_model('tests', 'ScoreBucket')
+    counts = Counter(
+        (test_id, math.floor(round(value, 6))) for test_id, value
+        in PassedTests.objects.values_list('passed_test_id', 'score')
+        .order_by().iterator()
+    )
+    counts.update(
+        (None, math.floor(round(value, 6))) for value
+        in UserScore.objects.values_list('total_score', flat=True)
+        .order_by().iterator()
+    )
+    ScoreBucket.objects.bulk_create(
+        (ScoreBucket(test_id=test_id, points=points, count=count)
+         for (test_id, points), count in counts.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0025_attempt_responses'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('test', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='score_buckets', to='tests.test')),
+            ],
+            options={
+                'verbose_name': 'Score bucket',
+                'verbose_name_plural': 'Score buckets',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='scorebucket',
+            constraint=models.UniqueConstraint(fields=('test', 'points'), name='score_bucket_test_points'),
+        ),
+        migrations.AddConstraint(
+            model_name='scorebucket',
+            constraint=models.UniqueConstraint(condition=models.Q(test=None), fields=('points',), name='score_bucket_global_points'),
+        ),
+        migrations.RunPython(fill_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.4 on 2021-01-22 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0026_score_buckets'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='passedtests',
+            name='score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 3.1.4 on 2021-01-22 12:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0027_passed_test_score_derived'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ScoreBucket',
+        ),
+    ]
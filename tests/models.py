@@ -1,8 +1,11 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils import timezone
 
 from django_tests_mini_platform.settings import MINIMUM_QUESTIONS
+from tests.thumbnails import validate_avatar
 
 
 class TestsUser(AbstractUser):
@@ -22,6 +25,7 @@ class TestsUser(AbstractUser):
         default='default_avatar.png',
         null=True,
         blank=True,
+        validators=[validate_avatar],
     )
     tests = models.ManyToManyField(
         'Test',
@@ -48,6 +52,32 @@ class TestsUser(AbstractUser):
         return self.full_name
 
 
+class TestQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = [obj.apply_draft_rule() for obj in objs]
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = [obj.apply_draft_rule() for obj in objs]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def passed_by(self, user):
+        """ tests passed by user, as EXISTS over the PassedTests index """
+        return self.filter(self._passed_by(user))
+
+    def unmatched_by(self, user):
+        """ tests not passed by user, as NOT EXISTS (an anti-join) """
+        return self.filter(~self._passed_by(user))
+
+    @staticmethod
+    def _passed_by(user):
+        return models.Exists(PassedTests.objects.filter(
+            tests_user=user,
+            passed_test=models.OuterRef('pk'),
+        ))
+
+
 class Test(models.Model):
     """
     Test
@@ -61,25 +91,72 @@ class Test(models.Model):
         related_name='authors_tests',
         on_delete=models.CASCADE
     )
+    # denormalized counters, maintained by tests.signals
+    # and rebuilt by the rebuild_test_counters command
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+    pass_count = models.PositiveIntegerField(default=0, editable=False)
+    # maintained by tests.search, PostgreSQL only
+    search_vector = SearchVectorField(null=True, editable=False)
+    # questions drawn for one attempt, all of them when empty
+    pool_size = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1)],
+        help_text='Questions drawn at random for every attempt, '
+                  'empty for all of them',
+    )
 
-    @property
-    def question_count(self):
-        return self.test_questions.count()
+    DERIVED_FIELDS = ('question_count', 'pass_count', 'search_vector')
 
-    @property
-    def pass_count(self):
-        return self.users_who_passed_test.count()
+    objects = TestQuerySet.as_manager()
 
-    def save(self, *args, **kwargs):
+    def apply_draft_rule(self):
         # the session is draft, while don't have MINIMUM questions
-        if self.test_questions.count() < MINIMUM_QUESTIONS:
+        if self.question_count < MINIMUM_QUESTIONS:
             self.draft = True
+        return self
+
+    def save(self, *args, **kwargs):
+        self.apply_draft_rule()
+        # counters and search vector are changed only by queryset updates,
+        # don't overwrite them with stale in-memory values
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DERIVED_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = 'Test'
         verbose_name_plural = 'Tests'
         ordering = ['created_at', 'title']
+        indexes = [
+            models.Index(
+                fields=['draft', 'created_at'],
+                name='test_draft_created_idx',
+            ),
+            # TestsView lists only published tests
+            models.Index(
+                fields=['created_at', 'id'],
+                name='test_published_created_idx',
+                condition=models.Q(draft=False),
+            ),
+            # MyTestsView
+            models.Index(
+                fields=['author', 'created_at'],
+                name='test_author_created_idx',
+            ),
+        ]
+        constraints = [
+            # catches bulk and queryset updates that skip apply_draft_rule
+            models.CheckConstraint(
+                check=models.Q(draft=True)
+                | models.Q(question_count__gte=MINIMUM_QUESTIONS),
+                name='published_test_has_questions',
+            ),
+        ]
 
     def __str__(self):
         return f'test: "{self.title}"'
@@ -91,15 +168,69 @@ class PassedTests(models.Model):
     right_answers_count = models.PositiveIntegerField()
     question_count = models.PositiveIntegerField()
     pass_date_time = models.DateTimeField(default=timezone.now)
+    # materialized from the TestAttempt history
+    latest_attempt = models.ForeignKey(
+        'TestAttempt',
+        related_name='+',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+    )
+    attempts_count = models.PositiveIntegerField(default=1)
+    best_percentage = models.FloatField(default=0)
+    # percentage of the latest attempt, the test leaderboard key
+    score = models.FloatField(default=0, editable=False)
+
+    SCORE_FIELDS = frozenset(['right_answers_count', 'question_count'])
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # tests.signals moves a changed result on the leaderboards
+        # from the score it was loaded with
+        instance.loaded_score = instance.__dict__.get('score')
+        return instance
 
     @property
     def percentage(self):
         return round((self.right_answers_count * 100 / self.question_count), 2)
 
+    def apply_score(self):
+        # unrounded, the same as tests.profiles.score() computes in SQL
+        self.score = self.right_answers_count * 100 / self.question_count \
+            if self.question_count else 0.0
+        return self
+
+    def save(self, *args, **kwargs):
+        self.apply_score()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None \
+                and not self.SCORE_FIELDS.isdisjoint(update_fields):
+            kwargs['update_fields'] = [*update_fields, 'score']
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['pass_date_time']
         verbose_name = "Passed test"
         verbose_name_plural = "Passed tests"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tests_user', 'passed_test'],
+                name='unique_user_passed_test',
+            ),
+        ]
+        indexes = [
+            # user profile history
+            models.Index(
+                fields=['tests_user', 'pass_date_time'],
+                name='passed_user_date_idx',
+            ),
+            # test leaderboard and rank lookups, see tests.leaderboards
+            models.Index(
+                fields=['passed_test', '-score', 'pass_date_time'],
+                name='passed_test_leaderboard_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'"{self.passed_test.title}" -' \
@@ -107,6 +238,77 @@ class PassedTests(models.Model):
                f'{self.right_answers_count} right / {self.percentage}%'
 
 
+class UserScore(models.Model):
+    """
+    Global leaderboard entry: sum of the user test scores,
+    refreshed on every submission by tests.leaderboards
+    """
+    user = models.OneToOneField(
+        TestsUser,
+        related_name='global_score',
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    total_score = models.FloatField(default=0)
+    tests_passed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'User score'
+        verbose_name_plural = 'User scores'
+        indexes = [
+            models.Index(
+                fields=['-total_score', 'updated_at'],
+                name='user_score_rank_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user.full_name}: {self.total_score}'
+
+
+class TestAttempt(models.Model):
+    """
+    One test submission.
+    Append-only, PassedTests keeps the latest and best score.
+    """
+    tests_user = models.ForeignKey(
+        TestsUser,
+        related_name='test_attempts',
+        on_delete=models.CASCADE
+    )
+    passed_test = models.ForeignKey(
+        Test,
+        related_name='attempts',
+        on_delete=models.CASCADE
+    )
+    right_answers_count = models.PositiveIntegerField()
+    question_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    # PRNG seed of the questions sample and answers order,
+    # empty when all questions were asked in order
+    seed = models.BigIntegerField(null=True, blank=True)
+    # responses packed by tests.grading.pack_responses: the asked
+    # question ids as little-endian uint32 and the chosen answer values
+    # one byte each (0 unanswered), empty for attempts stored before
+    question_ids = models.BinaryField(null=True, blank=True)
+    answers = models.BinaryField(null=True, blank=True)
+
+    @property
+    def percentage(self):
+        return round((self.right_answers_count * 100 / self.question_count), 2)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Test attempt'
+        verbose_name_plural = 'Test attempts'
+
+    def __str__(self):
+        return f'"{self.passed_test.title}" -' \
+               f' {self.tests_user.full_name} at {self.created_at}:  ' \
+               f'{self.right_answers_count} right / {self.percentage}%'
+
+
 class Question(models.Model):
     class RightAnswer(models.IntegerChoices):
         ONE = 1
@@ -127,9 +329,20 @@ class Question(models.Model):
     )
 
     class Meta:
-        ordering = ['test', 'text']
+        ordering = ['test_id', 'text']
         verbose_name = 'Question'
         verbose_name_plural = 'Questions'
+        indexes = [
+            models.Index(
+                fields=['test', 'text'],
+                name='question_test_text_idx',
+            ),
+        ]
+
+    @property
+    def answers(self):
+        return [self.answer_one, self.answer_two,
+                self.answer_three, self.answer_four]
 
     def __str__(self):
         return f'{self.test.title} -> {self.text[:25]}...'
@@ -153,6 +366,12 @@ class Comment(models.Model):
         ordering = ['created_at']
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
+        indexes = [
+            models.Index(
+                fields=['test', 'created_at'],
+                name='comment_test_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.full_name} to {self.test.title}: {self.text}'
@@ -0,0 +1,107 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class CursorPage:
+    """
+    One page of a CursorPaginator, no page numbers and no total count
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over (ordering field, id).
+    Each page is one indexed range query of per_page + 1 rows,
+    cursors are opaque url-safe tokens.
+    """
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = ordering.startswith('-')
+        self.field_name = ordering.lstrip('-')
+        self.field = queryset.model._meta.get_field(self.field_name)
+
+    def encode(self, obj, direction):
+        # value_to_string keeps full precision (microseconds included)
+        value = self.field.value_to_string(obj)
+        payload = json.dumps([direction, value, obj.pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        """
+        (direction, value, id) or None for a missing / broken cursor
+        """
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, value, pk = json.loads(
+                base64.urlsafe_b64decode(padded.encode()))
+            if direction not in (self.NEXT, self.PREVIOUS):
+                return None
+            return direction, self.field.to_python(value), int(pk)
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def ordered(self, forward):
+        ascending = forward != self.descending
+        prefix = '' if ascending else '-'
+        return self.queryset.order_by(
+            f'{prefix}{self.field_name}', f'{prefix}pk'), ascending
+
+    def page(self, cursor=None):
+        position = self.decode(cursor)
+        forward = position is None or position[0] == self.NEXT
+        queryset, ascending = self.ordered(forward)
+
+        if position is not None:
+            _, value, pk = position
+            lookup = 'gt' if ascending else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field_name}__{lookup}': value})
+                | Q(**{self.field_name: value, f'pk__{lookup}': pk})
+            )
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        if not rows:
+            return CursorPage(rows)
+
+        if forward:
+            has_next, has_previous = has_more, position is not None
+        else:
+            has_next, has_previous = True, has_more
+        return CursorPage(
+            rows,
+            self.encode(rows[-1], self.NEXT) if has_next else None,
+            self.encode(rows[0], self.PREVIOUS) if has_previous else None,
+        )
@@ -0,0 +1,62 @@
+from django.core.paginator import Paginator
+from django.db.models import Avg, Case, Count, F, FloatField, Max, Min, \
+    Sum, Value, When
+
+from django_tests_mini_platform.settings import PROFILE_PAGE_SIZE, \
+    PROFILE_STATS_CACHE_TIMEOUT
+from tests.cache import cached, get_version
+from tests.models import PassedTests
+
+# version of a user results, bumped by tests.signals
+PROFILE_VERSION = 'profile'
+
+
+def score():
+    """
+    Percentage of right answers, computed by the database,
+    0 for a result without questions
+    """
+    return Case(
+        When(question_count=0, then=Value(0.0)),
+        default=F('right_answers_count') * 100.0 / F('question_count'),
+        output_field=FloatField(),
+    )
+
+
+def user_results(user_id):
+    return PassedTests.objects.filter(tests_user_id=user_id)
+
+
+def build_profile_stats(user_id):
+    return user_results(user_id).aggregate(
+        tests_passed=Count('id'),
+        attempts=Sum('attempts_count'),
+        average_percentage=Avg(score()),
+        best_percentage=Max(score()),
+        worst_percentage=Min(score()),
+    )
+
+
+def profile_stats(user_id):
+    """
+    Aggregated results of a user, cached until the next attempt
+    """
+    version = get_version(PROFILE_VERSION, user_id)
+    return cached(
+        'profile_stats',
+        f'profile_stats:{user_id}:{version}',
+        lambda: build_profile_stats(user_id),
+        PROFILE_STATS_CACHE_TIMEOUT,
+    )
+
+
+def profile_results_page(user_id, page_number):
+    """
+    One page of the user results with their tests and scores
+    """
+    results = user_results(user_id) \
+        .select_related('passed_test') \
+        .only('right_answers_count', 'question_count', 'pass_date_time',
+              'score', 'passed_test__id', 'passed_test__title') \
+        .order_by('pass_date_time', 'id')
+    return Paginator(results, PROFILE_PAGE_SIZE).get_page(page_number)
@@ -0,0 +1,206 @@
+"""
+Query and latency budget of every named route against a fixed dataset.
+RouteBudgetTests compares a run with the baseline,
+`manage.py update_route_baseline` rewrites it.
+"""
+import json
+import statistics
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from django_tests_mini_platform.settings import ROUTE_LATENCY_CHECK, \
+    ROUTE_LATENCY_RATIO, ROUTE_LATENCY_SLACK_MS
+from tests import async_views
+from tests.grading import new_attempt
+from tests.models import Comment, PassedTests, Question, Test, TestsUser
+
+BASELINE = Path(__file__).parent / 'fixtures' / 'route_baseline.json'
+# timed runs of a warm route, the median counts
+RUNS = 5
+
+
+def create_route_dataset():
+    """
+    30 published tests of 10 questions, 21 users passed the first 10,
+    60 comments on the first one
+    """
+    author = TestsUser.objects.create(username='author', is_staff=True)
+    user = TestsUser.objects.create(username='reader')
+    users = [TestsUser.objects.create(username=f'user {i}')
+             for i in range(20)]
+    tests = []
+    for i in range(30):
+        test = Test.objects.create(title=f'test {i}', author=author)
+        for j in range(10):
+            Question.objects.create(
+                test=test, text=f'question {j}', answer_one='1',
+                answer_two='2', answer_three='3', answer_four='4',
+                right_answer=1)
+        test.draft = False
+        test.save()
+        tests.append(test)
+    for tests_user in users + [user]:
+        for test in tests[:10]:
+            PassedTests.objects.create(
+                tests_user=tests_user, passed_test=test,
+                right_answers_count=7, question_count=10)
+    Comment.objects.bulk_create(
+        Comment(test=tests[0], user=tests_user,
+                text=f'comment {tests_user.id}')
+        for tests_user in users * 3
+    )
+    return SimpleNamespace(author=author, user=user, test=tests[0])
+
+
+def answers(test):
+    return {str(question_id): str(right_answer) for question_id,
+            right_answer in test.test_questions.values_list(
+                'id', 'right_answer')}
+
+
+def new_question(test):
+    return Question.objects.create(
+        test=test, text='extra', answer_one='1', answer_two='2',
+        answer_three='3', answer_four='4', right_answer=1)
+
+
+def route_requests(data):
+    """
+    {route name: function returning (user, method, path, data)}
+    """
+    author, user, test = data.author, data.user, data.test
+    test_kwargs = {'kwargs': {'pk': test.id}}
+
+    def attempt():
+        """ answers with the attempt token the test pass form carries """
+        return {'test_id': test.id, 'attempt': new_attempt(test)[0],
+                **answers(test)}
+
+    return {
+        'login': lambda: (None, 'get', reverse('tests:login'), None),
+        'logout': lambda: (user, 'get', reverse('tests:logout'), None),
+        'register': lambda: (None, 'get', reverse('tests:register'), None),
+        'profile': lambda: (user, 'get', reverse(
+            'tests:profile', kwargs={'pk': user.id}), None),
+        'comment': lambda: (user, 'post', reverse('tests:comment'),
+                            {'test_id': test.id, 'text': 'new'}),
+        'comment_feed': lambda: (user, 'get', reverse(
+            'tests:comment_feed', **test_kwargs), None),
+        'tests': lambda: (user, 'get', reverse('tests:tests'), None),
+        'my_tests': lambda: (author, 'get', reverse('tests:my_tests'), None),
+        'test_edit': lambda: (author, 'get', reverse(
+            'tests:test_edit', **test_kwargs), None),
+        'create_test': lambda: (
+            author, 'get', reverse('tests:create_test'), None),
+        'test_detail': lambda: (user, 'get', reverse(
+            'tests:test_detail', **test_kwargs), None),
+        'test_pass': lambda: (user, 'get', reverse(
+            'tests:test_pass', **test_kwargs), None),
+        'test_leaderboard': lambda: (user, 'get', reverse(
+            'tests:test_leaderboard', **test_kwargs), None),
+        'leaderboard': lambda: (
+            user, 'get', reverse('tests:leaderboard'), None),
+        'test_check': lambda: (
+            user, 'post', reverse('tests:test_check'), attempt()),
+        'test_check_async': lambda: (
+            user, 'post', reverse('tests:test_check_async'), attempt()),
+        'api_test_check': lambda: (
+            user, 'post', reverse('tests:api_test_check', **test_kwargs),
+            json.dumps({'answers': answers(test),
+                        'attempt': new_attempt(test)[0]})),
+        'comment_async': lambda: (
+            user, 'post', reverse('tests:comment_async'),
+            {'test_id': test.id, 'text': 'new'}),
+        'add_question': lambda: (
+            author, 'post', reverse('tests:add_question'), {
+                'test_id': test.id, 'text': 'added', 'answer_one': '1',
+                'answer_two': '2', 'answer_three': '3', 'answer_four': '4',
+                'right_answer': 1}),
+        'delete_question': lambda: (
+            author, 'post', reverse('tests:delete_question', kwargs={
+                'pk': new_question(test).id}),
+            {'test_id': test.id}),
+        'request_stats': lambda: (
+            author, 'get', reverse('tests:request_stats'), None),
+    }
+
+
+@contextmanager
+def inline_db_calls():
+    """
+    Run the ORM calls of async views on this thread, where the
+    queries are captured (and a test transaction is visible)
+    """
+    executor = async_views.DB_EXECUTOR
+    async_views.DB_EXECUTOR = None
+    try:
+        yield
+    finally:
+        async_views.DB_EXECUTOR = executor
+
+
+def measure(client, route):
+    """
+    (queries, median milliseconds, status code) of a warm route,
+    the first run warms the caches
+    """
+    timings = []
+    for _ in range(RUNS + 1):
+        user, method, path, data = route()
+        client.logout()
+        if user:
+            client.force_login(user)
+        content_type = {'content_type': 'application/json'} \
+            if isinstance(data, str) else {}
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(path, data, **content_type)
+            timings.append((time.perf_counter() - start) * 1000)
+    return len(queries), statistics.median(timings[1:]), \
+        response.status_code
+
+
+def measure_routes(client, data):
+    """ {route name: (queries, milliseconds, status code)} """
+    with inline_db_calls():
+        return {name: measure(client, route)
+                for name, route in sorted(route_requests(data).items())}
+
+
+def over_budget(name, queries, ms, baseline,
+                check_latency=ROUTE_LATENCY_CHECK):
+    """
+    Why a measured route breaks its baseline, empty when it does not.
+    Latency may grow up to ROUTE_LATENCY_RATIO times the baseline
+    plus ROUTE_LATENCY_SLACK_MS, loose enough for a noisy CI runner.
+    """
+    expected = baseline.get(name)
+    if expected is None:
+        return [f'{name} has no baseline, run update_route_baseline']
+    errors = []
+    if queries > expected['queries']:
+        errors.append(f'{name} runs {queries} queries, '
+                      f'the baseline {expected["queries"]}')
+    limit = expected['ms'] * ROUTE_LATENCY_RATIO + ROUTE_LATENCY_SLACK_MS
+    if check_latency and ms > limit:
+        errors.append(f'{name} takes {ms:.2f} ms, the budget {limit:.2f}')
+    return errors
+
+
+def read_baseline():
+    """ {route name: {'queries': .., 'ms': ..}} """
+    return json.loads(BASELINE.read_text())
+
+
+def write_baseline(results):
+    """ results as measure_routes returns them """
+    BASELINE.write_text(json.dumps(
+        {name: {'queries': queries, 'ms': round(ms, 2)}
+         for name, (queries, ms, _) in results.items()},
+        indent=2, sort_keys=True) + '\n')
@@ -0,0 +1,157 @@
+"""
+Full-text search over the tests catalogue.
+
+PostgreSQL: weighted tsvector in Test.search_vector (GIN index)
+with a pg_trgm fallback on the title for fuzzy matches.
+SQLite: FTS5 virtual table tests_test_fts ranked by bm25.
+Structures are created by migration 0017_test_search.
+"""
+from collections import defaultdict
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, \
+    Value, When, TextField
+from django.db.models.functions import Coalesce
+
+from django_tests_mini_platform.settings import TESTS_SEARCH_CONFIG, \
+    TESTS_SEARCH_INCLUDE_QUESTIONS, TESTS_SEARCH_LIMIT
+from tests.models import Test, Question
+
+FTS_TABLE = 'tests_test_fts'
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def questions_text():
+    """ All question texts of the outer test, as one string """
+    texts = Question.objects.filter(test=OuterRef('pk')).order_by() \
+        .values('test').annotate(text=StringAgg('text', ' ')).values('text')
+    return Coalesce(Subquery(texts), Value(''), output_field=TextField())
+
+
+def search_vector():
+    vector = SearchVector('title', weight='A', config=TESTS_SEARCH_CONFIG) \
+        + SearchVector('description', weight='B', config=TESTS_SEARCH_CONFIG)
+    if TESTS_SEARCH_INCLUDE_QUESTIONS:
+        vector += SearchVector(
+            questions_text(), weight='C', config=TESTS_SEARCH_CONFIG)
+    return vector
+
+
+def index_tests(test_ids=None):
+    """
+    Refresh search documents of the given tests (all tests for None)
+    """
+    tests = Test.objects.all()
+    if test_ids is not None:
+        tests = tests.filter(id__in=test_ids)
+
+    if is_postgresql():
+        tests.update(search_vector=search_vector())
+    elif connection.vendor == 'sqlite':
+        index_sqlite(tests)
+
+
+def index_sqlite(tests):
+    documents = {
+        test_id: [title, description, '']
+        for test_id, title, description
+        in tests.values_list('id', 'title', 'description')
+    }
+    if not documents:
+        return
+    if TESTS_SEARCH_INCLUDE_QUESTIONS:
+        texts = defaultdict(list)
+        questions = Question.objects.filter(test_id__in=documents) \
+            .order_by().values_list('test_id', 'text')
+        for test_id, text in questions:
+            texts[test_id].append(text)
+        for test_id, question_texts in texts.items():
+            documents[test_id][2] = ' '.join(question_texts)
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(test_id,) for test_id in documents]
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, questions) '
+            f'VALUES (%s, %s, %s, %s)',
+            [(test_id, *document) for test_id, document in documents.items()]
+        )
+
+
+def unindex_test(test_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [test_id])
+
+
+def fts5_query(search):
+    """
+    User input as a safe FTS5 expression: every word as a quoted prefix
+    """
+    words = search.replace('"', ' ').split()
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def sqlite_matches(queryset, query):
+    """
+    [(test id, bm25)] of the best FTS5 matches that pass the queryset
+    filters (drafts, passed tests, ...), at most TESTS_SEARCH_LIMIT:
+    pages of the ranked matches are filtered until the limit is filled
+    """
+    matches = []
+    offset = 0
+    with connection.cursor() as cursor:
+        while len(matches) < TESTS_SEARCH_LIMIT:
+            cursor.execute(
+                f'SELECT rowid, bm25({FTS_TABLE}, 10.0, 4.0, 1.0) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY 2 LIMIT %s OFFSET %s',
+                [query, TESTS_SEARCH_LIMIT, offset]
+            )
+            page = cursor.fetchall()
+            kept = set(queryset.filter(id__in=[pk for pk, _ in page])
+                       .values_list('id', flat=True))
+            matches.extend(row for row in page if row[0] in kept)
+            if len(page) < TESTS_SEARCH_LIMIT:
+                break
+            offset += len(page)
+    return matches[:TESTS_SEARCH_LIMIT]
+
+
+def search_tests(queryset, search):
+    """
+    Filter the tests queryset by search text and annotate search_rank
+    """
+    if is_postgresql():
+        query = SearchQuery(
+            search, config=TESTS_SEARCH_CONFIG, search_type='websearch')
+        return queryset.annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+            + TrigramSimilarity('title', search),
+        ).filter(
+            # trigram_similar (%) is served by the title gin_trgm_ops index
+            Q(search_vector=query) | Q(title__trigram_similar=search)
+        )
+
+    if connection.vendor == 'sqlite' and fts5_query(search):
+        ranks = sqlite_matches(queryset, fts5_query(search))
+        if ranks:
+            # bm25 is lower for better matches
+            return queryset.filter(id__in=[pk for pk, _ in ranks]).annotate(
+                search_rank=Case(
+                    *[When(id=pk, then=Value(-rank)) for pk, rank in ranks],
+                    output_field=FloatField(),
+                )
+            )
+
+    return queryset.filter(title__icontains=search) \
+        .annotate(search_rank=Value(0.0, output_field=FloatField()))
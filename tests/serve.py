@@ -0,0 +1,74 @@
+"""
+Static and media files served by Django itself, cache friendly:
+ETag / Last-Modified revalidation, Cache-Control by kind of file
+and precompressed .br / .gz variants picked by Accept-Encoding
+"""
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+# name.0123456789ab.css written by ManifestStaticFilesStorage
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^/]+$')
+# preference order
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def accepted_encodings(request):
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    return {
+        part.split(';')[0].strip() for part in header.split(',')
+        if not part.strip().endswith(';q=0')
+    }
+
+
+def pick_variant(request, fullpath):
+    """ (path on disk, content encoding or None) """
+    accepted = accepted_encodings(request)
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and os.path.isfile(fullpath + suffix):
+            return fullpath + suffix, encoding
+    return fullpath, None
+
+
+def serve_file(request, path, document_root, max_age, hashed_max_age=None):
+    """
+    Serve document_root/path. Content-hashed names get hashed_max_age
+    and immutable, the others max_age and are revalidated with ETag.
+    """
+    # SuspiciousFileOperation (400) outside of document_root
+    fullpath = safe_join(document_root, posixpath.normpath(path).lstrip('/'))
+    if not os.path.isfile(fullpath):
+        raise Http404('Not found')
+
+    filepath, encoding = pick_variant(request, fullpath)
+    stats = os.stat(filepath)
+    etag = f'"{stats.st_mtime_ns:x}-{stats.st_size:x}' \
+           f'{"-" + encoding if encoding else ""}"'
+    last_modified = int(stats.st_mtime)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type, _ = mimetypes.guess_type(fullpath)
+        response = FileResponse(
+            open(filepath, 'rb'),
+            content_type=content_type or 'application/octet-stream')
+        response['Content-Length'] = stats.st_size
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if hashed_max_age and HASHED_NAME.search(path):
+        response['Cache-Control'] = \
+            f'public, max-age={hashed_max_age}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={max_age}'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
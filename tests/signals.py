@@ -0,0 +1,159 @@
+from django.core.files.storage import default_storage
+from django.db.models import Case, F, Value, When
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from django_tests_mini_platform.settings import MINIMUM_QUESTIONS, \
+    TESTS_SEARCH_INCLUDE_QUESTIONS
+from tests.cache import bump_version
+from tests.catalogue import CATALOGUE_VERSION, CATALOGUE_ID
+from tests.comments import COMMENTS_VERSION
+from tests.grading import QUESTIONS_VERSION
+from tests.leaderboards import record_score
+from tests.models import Test, Question, PassedTests, Comment, TestsUser
+from tests.profiles import PROFILE_VERSION
+from tests.search import index_tests, unindex_test
+from tests.thumbnails import make_thumbnails, thumbnail_name, \
+    DEFAULT_AVATAR
+
+# TestsUser fields serialized into the cached comment pages
+COMMENTER_FIELDS = frozenset(['avatar', 'first_name', 'last_name',
+                              'username'])
+
+
+def change_counter(test_id, field, delta):
+    """
+    Shift a denormalized Test counter in one UPDATE,
+    without loading the test
+    """
+    Test.objects.filter(id=test_id).update(**{field: F(field) + delta})
+
+
+def indexed_fields_saved(update_fields, fields):
+    """ False when save(update_fields=...) left the searched text alone """
+    return update_fields is None or not fields.isdisjoint(update_fields)
+
+
+@receiver(post_save, sender=Test)
+def test_saved(sender, instance, update_fields=None, **kwargs):
+    if indexed_fields_saved(update_fields, {'title', 'description'}):
+        index_tests([instance.id])
+
+
+@receiver(post_delete, sender=Test)
+def test_deleted(sender, instance, **kwargs):
+    unindex_test(instance.id)
+
+
+def sync_cached_test(question, delta):
+    """
+    Keep the counter of an already loaded question.test in step,
+    its later save() decides on draft from it
+    """
+    if Question.test.is_cached(question):
+        question.test.question_count += delta
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, update_fields=None,
+                   **kwargs):
+    if created:
+        change_counter(instance.test_id, 'question_count', 1)
+        sync_cached_test(instance, 1)
+    # QuestionCreateView and the admin save through here
+    bump_version(QUESTIONS_VERSION, instance.test_id)
+    if TESTS_SEARCH_INCLUDE_QUESTIONS \
+            and indexed_fields_saved(update_fields, {'text'}):
+        index_tests([instance.test_id])
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    # the test goes back to draft when it drops below the minimum,
+    # the condition sees question_count before the decrement
+    Test.objects.filter(id=instance.test_id).update(
+        question_count=F('question_count') - 1,
+        draft=Case(
+            When(question_count__lte=MINIMUM_QUESTIONS, then=Value(True)),
+            default=F('draft'),
+        ),
+    )
+    sync_cached_test(instance, -1)
+    # DeleteQuestionView and test cascades delete through here
+    bump_version(QUESTIONS_VERSION, instance.test_id)
+    if TESTS_SEARCH_INCLUDE_QUESTIONS:
+        index_tests([instance.test_id])
+
+
+@receiver(post_save, sender=PassedTests)
+def passed_test_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(instance.passed_test_id, 'pass_count', 1)
+        bump_version(CATALOGUE_VERSION, CATALOGUE_ID)
+        previous = None
+    else:
+        # results edited in place (the admin), save_result moves
+        # them with queryset updates and records the change itself
+        previous = getattr(instance, 'loaded_score', None)
+        if previous is None or previous == instance.score:
+            return
+    record_score(instance.tests_user_id, previous, instance.score,
+                 instance.pass_date_time)
+    instance.loaded_score = instance.score
+
+
+@receiver(post_delete, sender=PassedTests)
+def passed_test_deleted(sender, instance, **kwargs):
+    change_counter(instance.passed_test_id, 'pass_count', -1)
+    record_score(instance.tests_user_id, instance.score, None)
+
+
+@receiver(post_save, sender=Test)
+@receiver(post_delete, sender=Test)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=PassedTests)
+def catalogue_changed(sender, instance, **kwargs):
+    # titles, drafts, question and pass counts of the catalogue rows
+    bump_version(CATALOGUE_VERSION, CATALOGUE_ID)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    bump_version(COMMENTS_VERSION, instance.test_id)
+
+
+@receiver(post_delete, sender=PassedTests)
+def user_results_changed(sender, instance, **kwargs):
+    # submissions bump it in tests.grading.save_result,
+    # after the result is written
+    bump_version(PROFILE_VERSION, instance.tests_user_id)
+
+
+@receiver(post_save, sender=TestsUser)
+def commenter_changed(sender, instance, created, update_fields=None,
+                      **kwargs):
+    # cached comment pages embed the name and avatar of their authors
+    if created or (update_fields is not None
+                   and COMMENTER_FIELDS.isdisjoint(update_fields)):
+        return
+    test_ids = Comment.objects.filter(user=instance).order_by() \
+        .values_list('test_id', flat=True).distinct()
+    for test_id in test_ids:
+        bump_version(COMMENTS_VERSION, test_id)
+
+
+@receiver(post_save, sender=TestsUser)
+def avatar_uploaded(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    name = str(instance.avatar or '')
+    if not name or name == DEFAULT_AVATAR:
+        return
+    if not default_storage.exists(thumbnail_name(name, 'small')):
+        try:
+            make_thumbnails(name)
+        except OSError:
+            # avatar_url falls back to the default avatar
+            pass
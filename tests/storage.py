@@ -0,0 +1,57 @@
+"""
+collectstatic storage writing content-hashed names
+with gzip and brotli variants next to them
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml',
+)
+# smaller files do not gain from compression
+COMPRESS_MIN_SIZE = 256
+
+
+def compressed_variants(content):
+    """ {'.gz': bytes, '.br': bytes} of the encodings that pay off """
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return {suffix: data for suffix, data in variants.items()
+            if len(data) < len(content)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # no collectstatic yet (tests, development): plain name
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        if self.size(name) < COMPRESS_MIN_SIZE:
+            return
+        with self.open(name) as file:
+            content = file.read()
+        for suffix, data in compressed_variants(content).items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(data))
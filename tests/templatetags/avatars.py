@@ -0,0 +1,14 @@
+from django import template
+
+from tests.thumbnails import avatar_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def avatar(image, size='small'):
+    """
+    {% avatar user.avatar 'profile' %}: URL of a resized avatar,
+    sizes are AVATAR_SIZES
+    """
+    return avatar_url(str(image or ''), size)
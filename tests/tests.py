@@ -1,3 +1,1414 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import tempfile
+import struct
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError, \
+    SuspiciousFileOperation, SuspiciousOperation
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.db import IntegrityError, connection
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, get_resolver
+import numpy as np
+from PIL import Image
+
+from django_tests_mini_platform.settings import TEST_COMMENTS_PAGE_SIZE, \
+    MINIMUM_QUESTIONS, DB_HEALTH_CHECK_INTERVAL
+from tests.cache import CACHE_STATS, bump_version, cache_stats, cached, \
+    get_stats, get_version
+from tests.comments import COMMENTS_VERSION
+from tests.db import check_connections
+from tests.grading import attempt_order, save_result, grade_submission, \
+    get_answer_key, grade
+from tests.item_analysis import build_item_analysis, item_analysis, \
+    load_responses
+from tests.profiles import profile_stats, profile_results_page
+from tests.leaderboards import test_leaderboard, test_rank, \
+    global_leaderboard, global_rank, rebuild_leaderboards
+from tests.metrics import REQUEST_STATS, RequestStats, histogram, \
+    percentile_summary
+from tests.middleware import RequestStatsMiddleware, TemplateRecorder
+from tests.models import Test, TestsUser, Question, Comment, PassedTests, \
+    TestAttempt, UserScore
+from tests.pagination import CursorPaginator
+from tests.routes import create_route_dataset, measure_routes, \
+    over_budget, read_baseline, route_requests
+from tests.search import search_tests
+from tests.serve import serve_file
+from tests.transfer import EXPORT_FORMATS, IMPORT_READERS, TransferError, \
+    export_records, import_records
+from tests.thumbnails import avatar_url, thumbnail_name, validate_avatar
+
+
+def create_test(author, title='test', questions=5, draft=False):
+    test = Test.objects.create(title=title, author=author)
+    for i in range(questions):
+        Question.objects.create(
+            test=test,
+            text=f'question {i}',
+            answer_one='1',
+            answer_two='2',
+            answer_three='3',
+            answer_four='4',
+            right_answer=1,
+        )
+    if not draft:
+        test.draft = False
+        test.save()
+    return test
+
+
+class TestDetailQueryBudgetTests(TestCase):
+    """
+    Test detail page costs the same number of queries
+    however many users passed or commented the test
+    """
+    # session, user, test with author, user result, comments page
+    QUERY_BUDGET = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestsUser.objects.create(username='reader')
+        cls.test = create_test(cls.user)
+        users = [TestsUser.objects.create(username=f'user {i}')
+                 for i in range(50)]
+        PassedTests.objects.bulk_create(
+            PassedTests(tests_user=user, passed_test=cls.test,
+                        right_answers_count=3, question_count=5)
+            for user in users
+        )
+        Comment.objects.bulk_create(
+            Comment(test=cls.test, user=user, text=f'comment {user.id}')
+            for user in users
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('tests:test_detail', kwargs={'pk': self.test.id})
+
+    def test_not_passed(self):
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['score_block'])
+
+    def test_passed(self):
+        PassedTests.objects.create(
+            tests_user=self.user, passed_test=self.test,
+            right_answers_count=4, question_count=5)
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(self.url)
+        self.assertTrue(response.context['score_block'])
+        self.assertEqual(response.context['percentage'], 80)
+
+    def test_comments_first_page_is_cached(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(self.QUERY_BUDGET - 1):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            len(response.context['comments']), TEST_COMMENTS_PAGE_SIZE)
+
+    def test_new_comment_invalidates_first_page(self):
+        Comment.objects.all().delete()
+        self.client.get(self.url)
+        Comment.objects.create(test=self.test, user=self.user, text='new')
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['comments'][0]['text'], 'new')
+
+    def test_comment_feed_pages(self):
+        feed_url = reverse('tests:comment_feed', kwargs={'pk': self.test.id})
+        page = self.client.get(feed_url).json()
+        ids = [comment['id'] for comment in page['comments']]
+        while page['next']:
+            page = self.client.get(feed_url, {'cursor': page['next']}).json()
+            ids += [comment['id'] for comment in page['comments']]
+        self.assertEqual(
+            ids,
+            list(Comment.objects.filter(test=self.test)
+                 .order_by('created_at', 'id').values_list('id', flat=True))
+        )
+
+    def test_comment_feed_missing_test(self):
+        missing = Test.objects.order_by('-id').first().id + 1
+        response = self.client.get(
+            reverse('tests:comment_feed', kwargs={'pk': missing}))
+        self.assertEqual(response.status_code, 404)
+        empty = create_test(self.user, title='no comments')
+        response = self.client.get(
+            reverse('tests:comment_feed', kwargs={'pk': empty.id}))
+        self.assertEqual(response.json(), {'comments': [], 'next': None})
+
+    def test_commenter_change_invalidates_first_page(self):
+        feed_url = reverse('tests:comment_feed', kwargs={'pk': self.test.id})
+        self.client.get(feed_url)
+        commenter = Comment.objects.order_by('created_at', 'id') \
+            .first().user
+        commenter.first_name, commenter.last_name = 'New', 'Name'
+        commenter.save()
+        comment = self.client.get(feed_url).json()['comments'][0]
+        self.assertEqual(comment['user_full_name'], 'New Name')
+
+        version = get_version(COMMENTS_VERSION, self.test.id)
+        commenter.save(update_fields=['last_login'])
+        self.assertEqual(get_version(COMMENTS_VERSION, self.test.id), version)
+        commenter.avatar = 'avatars/new.png'
+        commenter.save(update_fields=['avatar'])
+        self.assertNotEqual(
+            get_version(COMMENTS_VERSION, self.test.id), version)
+
+
+class DraftRuleTests(TestCase):
+    """
+    A test is published only with MINIMUM_QUESTIONS questions,
+    enforced without counting questions on every save
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = TestsUser.objects.create(username='author')
+
+    def test_save_does_not_count_questions(self):
+        test = Test(title='new', author=self.author, draft=False)
+        with CaptureQueriesContext(connection) as queries:
+            test.save()
+        self.assertTrue(test.draft)
+        self.assertFalse(
+            [q for q in queries if 'COUNT(' in q['sql'].upper()])
+
+    def test_published_with_enough_questions(self):
+        test = create_test(self.author, questions=MINIMUM_QUESTIONS)
+        test.refresh_from_db()
+        self.assertFalse(test.draft)
+        self.assertEqual(test.question_count, MINIMUM_QUESTIONS)
+
+    def test_bulk_create_without_extra_queries(self):
+        tests = [
+            Test(title='empty', author=self.author, draft=False),
+            Test(title='full', author=self.author, draft=False,
+                 question_count=MINIMUM_QUESTIONS),
+        ]
+        with self.assertNumQueries(1):
+            Test.objects.bulk_create(tests)
+        self.assertEqual(
+            dict(Test.objects.values_list('title', 'draft')),
+            {'empty': True, 'full': False}
+        )
+
+    def test_bulk_update_keeps_short_tests_draft(self):
+        short = create_test(self.author, title='short', questions=1)
+        full = create_test(self.author, title='full')
+        Test.objects.filter(id=full.id).update(draft=True)
+        full.refresh_from_db()
+        for test in (short, full):
+            test.draft = False
+        with self.assertNumQueries(1):
+            Test.objects.bulk_update([short, full], ['draft'])
+        short.refresh_from_db()
+        full.refresh_from_db()
+        self.assertTrue(short.draft)
+        self.assertFalse(full.draft)
+
+    def test_question_delete_unpublishes(self):
+        test = create_test(self.author)
+        test.test_questions.first().delete()
+        test.refresh_from_db()
+        self.assertTrue(test.draft)
+        self.assertEqual(test.question_count, MINIMUM_QUESTIONS - 1)
+
+    def test_database_rejects_short_published_test(self):
+        test = create_test(self.author, questions=1)
+        with self.assertRaises(IntegrityError):
+            Test.objects.filter(id=test.id).update(draft=False)
+
+
+class RouteBudgetTests(TestCase):
+    """
+    Every named route against a fixed dataset: fails when a route runs
+    more queries than in the baseline, or (ROUTE_LATENCY_CHECK=1) gets
+    much slower. `manage.py update_route_baseline` rewrites the baseline.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_route_dataset()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_every_route_is_covered(self):
+        names = {name for name in get_resolver('tests.urls').reverse_dict
+                 if isinstance(name, str)}
+        self.assertEqual(names, set(route_requests(self.data)))
+
+    def test_routes_within_baseline(self):
+        baseline = read_baseline()
+        for name, (queries, ms, status) in measure_routes(
+                self.client, self.data).items():
+            with self.subTest(route=name):
+                self.assertLess(status, 400, name)
+                self.assertEqual(
+                    over_budget(name, queries, ms, baseline), [])
+
+    @mock.patch('tests.routes.ROUTE_LATENCY_RATIO', 3)
+    @mock.patch('tests.routes.ROUTE_LATENCY_SLACK_MS', 50)
+    def test_latency_budget(self):
+        baseline = {'tests': {'queries': 2, 'ms': 10}}
+        # 3 times the baseline plus 50 ms
+        self.assertEqual(over_budget('tests', 2, 80, baseline, True), [])
+        self.assertEqual(len(over_budget('tests', 3, 81, baseline, True)), 2)
+        self.assertEqual(over_budget('tests', 2, 81, baseline, False), [])
+        self.assertTrue(over_budget('missing', 0, 0, baseline))
+
+
+@mock.patch('tests.async_views.DB_EXECUTOR', None)
+class AsyncSubmissionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestsUser.objects.create(username='student')
+        cls.test = create_test(cls.user)
+        cls.url = reverse('tests:api_test_check', kwargs={'pk': cls.test.id})
+
+    def post(self, answers):
+        return self.client.post(self.url, json.dumps({'answers': answers}),
+                                content_type='application/json')
+
+    def test_api_grades_and_stores_result(self):
+        self.client.force_login(self.user)
+        questions = list(self.test.test_questions.all())
+        answers = {question.id: question.right_answer
+                   for question in questions[:3]}
+        response = self.post(answers)
+        self.assertEqual(response.json(), {
+            'right': 3, 'total': len(questions), 'percentage': 60.0})
+        result = PassedTests.objects.get(tests_user=self.user)
+        self.assertEqual(result.right_answers_count, 3)
+
+    def test_api_requires_login(self):
+        self.assertEqual(self.post({}).status_code, 401)
+
+
+def image_file(width, height, name='avatar.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+class AvatarTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        avatar_url.cache_clear()
+        self.addCleanup(avatar_url.cache_clear)
+
+    def test_renditions_made_on_upload(self):
+        user = TestsUser.objects.create(
+            username='avatar', avatar=image_file(800, 600))
+        name = user.avatar.name
+        self.assertTrue(default_storage.exists(thumbnail_name(name, 'small')))
+        with default_storage.open(thumbnail_name(name, 'small')) as file:
+            self.assertEqual(Image.open(file).size, (96, 96))
+        self.assertEqual(avatar_url(name),
+                         default_storage.url(thumbnail_name(name, 'small')))
+
+    def test_missing_avatar_falls_back_to_default(self):
+        with open(os.path.join(default_storage.location,
+                               'default_avatar.png'), 'wb') as file:
+            Image.new('RGB', (10, 10)).save(file, 'PNG')
+        self.assertEqual(
+            avatar_url('avatars/missing.png', 'profile'),
+            avatar_url('default_avatar.png', 'profile'))
+
+    def test_rejects_large_images(self):
+        with self.assertRaises(ValidationError):
+            validate_avatar(image_file(5000, 10))
+        validate_avatar(image_file(400, 400))
+
+
+class ServeFileTests(TestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        self.content = b'body { color: red; }' * 50
+        for name, content in [
+            ('main.0123456789ab.css', self.content),
+            ('main.0123456789ab.css.gz', gzip.compress(self.content)),
+            ('plain.css', self.content),
+        ]:
+            with open(os.path.join(self.root, name), 'wb') as file:
+                file.write(content)
+        self.factory = RequestFactory()
+
+    def serve(self, path, **headers):
+        return serve_file(self.factory.get('/static/' + path, **headers),
+                          path, self.root, max_age=60, hashed_max_age=3600)
+
+    def test_hashed_names_are_immutable(self):
+        response = self.serve('main.0123456789ab.css')
+        self.assertEqual(response['Cache-Control'],
+                         'public, max-age=3600, immutable')
+        self.assertEqual(self.serve('plain.css')['Cache-Control'],
+                         'public, max-age=60')
+
+    def test_not_modified(self):
+        etag = self.serve('plain.css')['ETag']
+        response = self.serve('plain.css', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_precompressed_variant(self):
+        response = self.serve('main.0123456789ab.css',
+                              HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)),
+                         self.content)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_outside_document_root(self):
+        with self.assertRaises(SuspiciousFileOperation):
+            self.serve('../secret')
+        with self.assertRaises(Http404):
+            self.serve('missing.css')
+
+
+class CatalogueCacheTests(TestCase):
+    """
+    Catalogue pages are rendered once for all users
+    until a test, question or pass changes them
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = TestsUser.objects.create(username='author')
+        cls.reader = TestsUser.objects.create(username='reader')
+        cls.test = create_test(cls.author, title='cached title')
+        cls.url = reverse('tests:tests')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, user, **params):
+        self.client.force_login(user)
+        return self.client.get(self.url, params)
+
+    def test_shared_between_users(self):
+        self.get(self.author)
+        self.client.force_login(self.reader)
+        # session and user only
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'cached title')
+
+    def test_question_change_invalidates(self):
+        self.get(self.reader)
+        Question.objects.create(
+            test=self.test, text='new', answer_one='1', answer_two='2',
+            answer_three='3', answer_four='4', right_answer=1)
+        response = self.get(self.reader)
+        self.assertContains(response, f'<td>{MINIMUM_QUESTIONS + 1}</td>')
+
+    def test_passed_filter_not_cached(self):
+        self.get(self.reader, passed='passed')
+        PassedTests.objects.create(
+            tests_user=self.reader, passed_test=self.test,
+            right_answers_count=1, question_count=5)
+        self.assertContains(self.get(self.reader, passed='passed'),
+                            'cached title')
+        self.get(self.author, passed='passed')
+        self.assertNotContains(self.get(self.author, passed='passed'),
+                               'cached title')
+
+
+class TestPassFormCacheTests(TestCase):
+    """
+    The question blocks of the pass page are rendered once
+    per questions version
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestsUser.objects.create(username='student')
+        cls.test = create_test(cls.user)
+        cls.url = reverse('tests:test_pass', kwargs={'pk': cls.test.id})
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_blocks_cached(self):
+        self.client.get(self.url)
+        # session, user, test
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'type="radio"', count=4 * 5)
+
+    def test_new_question_invalidates(self):
+        self.client.get(self.url)
+        Question.objects.create(
+            test=self.test, text='added later', answer_one='1',
+            answer_two='2', answer_three='3', answer_four='4',
+            right_answer=1)
+        self.assertContains(self.client.get(self.url), 'added later')
+
+
+class QuestionPoolTests(TestCase):
+    """
+    An attempt asks pool_size questions of the test in a seeded order
+    and is graded against those only
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestsUser.objects.create(username='student')
+        cls.test = create_test(cls.user, questions=10)
+        Test.objects.filter(id=cls.test.id).update(pool_size=3)
+        cls.key = dict(cls.test.test_questions.values_list(
+            'id', 'right_answer'))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def start(self):
+        response = self.client.get(
+            reverse('tests:test_pass', kwargs={'pk': self.test.id}))
+        return response, response.context['attempt']
+
+    def check(self, attempt, answers):
+        return self.client.post(reverse('tests:test_check'), {
+            'test_id': self.test.id, 'attempt': attempt, **answers})
+
+    def test_order_is_seeded(self):
+        order = attempt_order(self.key, 3, 42)
+        self.assertEqual(order, attempt_order(self.key, 3, 42))
+        self.assertEqual(len(order), 3)
+        for question_id, values in order:
+            self.assertIn(question_id, self.key)
+            self.assertEqual(sorted(values), [1, 2, 3, 4])
+
+    def test_pool_graded(self):
+        response, attempt = self.start()
+        self.assertContains(response, 'type="radio"', count=3 * 4)
+        asked = [
+            int(question_id) for question_id in self.key
+            if f'name="{question_id}"' in response.content.decode()]
+        self.check(attempt, {str(question_id): self.key[question_id]
+                             for question_id in asked})
+        attempt = TestAttempt.objects.get()
+        self.assertEqual(
+            (attempt.right_answers_count, attempt.question_count), (3, 3))
+        self.assertIsNotNone(attempt.seed)
+
+    def test_question_outside_pool_rejected(self):
+        response, attempt = self.start()
+        unasked = next(
+            question_id for question_id in self.key
+            if f'name="{question_id}"' not in response.content.decode())
+        self.assertEqual(self.check(attempt, {str(unasked): 1}).status_code,
+                         400)
+
+    def test_attempt_required_with_a_pool(self):
+        self.assertEqual(self.check('', {
+            str(question_id): answer
+            for question_id, answer in self.key.items()}).status_code, 400)
+        self.assertFalse(TestAttempt.objects.exists())
+
+    def test_tampered_attempt_rejected(self):
+        _, attempt = self.start()
+        self.assertEqual(self.check(attempt + 'x', {}).status_code, 400)
+
+
+class LeaderboardTests(TestCase):
+    """
+    Stored scores follow every submission and match a full rebuild
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = TestsUser.objects.create(username='author')
+        cls.first = create_test(cls.author, title='first')
+        cls.second = create_test(cls.author, title='second')
+        cls.users = [TestsUser.objects.create(username=f'user{i}')
+                     for i in range(3)]
+
+    def standings(self):
+        return [
+            [(result.tests_user_id, result.score)
+             for result in test_leaderboard(self.first.id)],
+            [(entry.user_id, entry.total_score)
+             for entry in global_leaderboard()],
+        ]
+
+    def test_ranks_follow_submissions(self):
+        alice, bob, carol = self.users
+        save_result(alice, self.first.id, 3, 5)
+        save_result(bob, self.first.id, 4, 5)
+        save_result(carol, self.first.id, 3, 5)
+        save_result(alice, self.second.id, 5, 5)
+
+        self.assertEqual(
+            [result.tests_user for result in test_leaderboard(self.first.id)],
+            [bob, alice, carol])
+        # the same score: the earlier pass goes first
+        self.assertEqual(test_rank(alice.id, self.first.id), 2)
+        self.assertEqual(test_rank(carol.id, self.first.id), 3)
+        self.assertIsNone(test_rank(bob.id, self.second.id))
+        self.assertEqual(global_rank(alice.id), 1)
+        self.assertEqual(UserScore.objects.get(user=alice).total_score, 160)
+
+        # a retake replaces the latest score
+        save_result(alice, self.first.id, 5, 5)
+        self.assertEqual(test_rank(alice.id, self.first.id), 1)
+        self.assertEqual(UserScore.objects.get(user=alice).total_score, 200)
+
+    def test_delete_and_rebuild(self):
+        alice, bob, _ = self.users
+        save_result(alice, self.first.id, 3, 5)
+        save_result(alice, self.second.id, 5, 5)
+        save_result(bob, self.first.id, 4, 5)
+        PassedTests.objects.filter(
+            tests_user=alice, passed_test=self.second).delete()
+        self.assertEqual(UserScore.objects.get(user=alice).tests_passed, 1)
+
+        standings = self.standings()
+        self.assertEqual(rebuild_leaderboards(), (2, 2))
+        self.assertEqual(self.standings(), standings)
+
+    def test_orm_results_on_the_boards(self):
+        alice, bob, _ = self.users
+        # the admin, seeds and imports write results without save_result
+        result = PassedTests.objects.create(
+            tests_user=alice, passed_test=self.first,
+            right_answers_count=4, question_count=5)
+        save_result(bob, self.first.id, 2, 5)
+        self.assertEqual(result.score, 80)
+        self.assertEqual(test_rank(alice.id, self.first.id), 1)
+        self.assertEqual(global_rank(bob.id), 2)
+
+        result = PassedTests.objects.get(id=result.id)
+        result.right_answers_count = 1
+        result.save(update_fields=['right_answers_count'])
+        self.assertEqual(UserScore.objects.get(user=alice).total_score, 20)
+        self.assertEqual(test_rank(bob.id, self.first.id), 1)
+
+        result.delete()
+        standings = self.standings()
+        rebuild_leaderboards()
+        self.assertEqual(self.standings(), standings)
+
+    def test_rank_matches_the_list(self):
+        alice, bob, carol = self.users
+        # 80.4 and 80.9 percent are different places
+        save_result(alice, self.first.id, 804, 1000)
+        save_result(bob, self.first.id, 809, 1000)
+        save_result(carol, self.first.id, 809, 1000)
+        listed = [result.tests_user_id
+                  for result in test_leaderboard(self.first.id)]
+        global_listed = [entry.user_id for entry in global_leaderboard()]
+        for user in self.users:
+            # the user result, then one count over the index
+            with self.assertNumQueries(2):
+                self.assertEqual(test_rank(user.id, self.first.id),
+                                 listed.index(user.id) + 1)
+            with self.assertNumQueries(2):
+                self.assertEqual(global_rank(user.id),
+                                 global_listed.index(user.id) + 1)
+        self.assertEqual(listed, [bob.id, carol.id, alice.id])
+
+    def test_deleted_user_leaves_the_boards(self):
+        # not a class user, delete() clears its pk
+        alice = TestsUser.objects.create(username='leaving')
+        bob = self.users[0]
+        save_result(alice, self.first.id, 5, 5)
+        save_result(bob, self.first.id, 3, 5)
+        alice.delete()
+        self.assertEqual(test_rank(bob.id, self.first.id), 1)
+        self.assertEqual(global_rank(bob.id), 1)
+        self.assertEqual(
+            list(UserScore.objects.values_list('user_id', flat=True)),
+            [bob.id])
+
+
+class ItemAnalysisTests(TestCase):
+    """
+    Responses are stored packed per attempt and analysed per question
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = TestsUser.objects.create(username='author')
+        cls.test = create_test(cls.author)
+        cls.question_ids = sorted(
+            cls.test.test_questions.values_list('id', flat=True))
+        # right answer is 1, 0 leaves the question unanswered
+        patterns = [
+            [1, 1, 1, 1, 1],
+            [1, 1, 1, 1, 2],
+            [1, 1, 3, 3, 3],
+            [1, 0, 2, 2, 2],
+        ]
+        for i, pattern in enumerate(patterns):
+            user = TestsUser.objects.create(username=f'user{i}')
+            grade_submission(user, cls.test.id, {
+                'test_id': str(cls.test.id),
+                **{str(question_id): str(answer) for question_id, answer
+                   in zip(cls.question_ids, pattern) if answer},
+            })
+
+    def test_responses_packed(self):
+        attempt = TestAttempt.objects.get(tests_user__username='user3')
+        self.assertEqual(
+            sorted(zip(struct.unpack('<5I', attempt.question_ids),
+                       bytes(attempt.answers))),
+            list(zip(self.question_ids, [1, 0, 2, 2, 2])))
+
+    def test_item_statistics(self):
+        analysis = build_item_analysis(self.test.id)
+        self.assertEqual(analysis['attempts'], 4)
+        first, second, _, _, last = analysis['questions']
+        self.assertEqual(
+            (first['difficulty'], first['discrimination']), (1.0, 0.0))
+        self.assertEqual(
+            (second['difficulty'], second['discrimination']), (0.75, 1.0))
+        self.assertEqual(second['unanswered'], 0.25)
+        self.assertEqual(last['answers'], [0.25, 0.5, 0.25, 0.0])
+
+    def test_responses_decoded_per_attempt(self):
+        rows, ids, answers = load_responses(self.test.id)
+        self.assertEqual(list(np.bincount(rows)), [5, 5, 5, 5])
+        self.assertEqual(sorted(set(ids.tolist())), self.question_ids)
+        self.assertEqual(int(answers.sum()), 5 + 6 + 11 + 7)
+
+    def test_edit_page_reads_the_cache(self):
+        cache.clear()
+        self.client.force_login(self.author)
+        url = reverse('tests:test_edit', kwargs={'pk': self.test.id})
+        with mock.patch('tests.item_analysis.build_item_analysis') as build:
+            self.assertContains(self.client.get(url), 'Not analysed yet')
+            build.assert_not_called()
+        self.assertIsNone(item_analysis(self.test.id))
+
+        call_command('analyze_items', test=[self.test.id],
+                     stdout=io.StringIO())
+        with mock.patch('tests.item_analysis.build_item_analysis') as build:
+            self.assertContains(self.client.get(url), '4 attempts')
+            build.assert_not_called()
+        self.assertEqual(item_analysis(self.test.id)['attempts'], 4)
+
+
+class ProfileTests(TestCase):
+    """
+    Cached profile stats follow the user results, results are paged
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = TestsUser.objects.create(username='author')
+        cls.tests = [create_test(cls.author, title=f'test {i}')
+                     for i in range(3)]
+        cls.user = TestsUser.objects.create(username='student')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stats_follow_submissions(self):
+        self.assertEqual(profile_stats(self.user.id)['tests_passed'], 0)
+        save_result(self.user, self.tests[0].id, 5, 5)
+        save_result(self.user, self.tests[1].id, 0, 5)
+        stats = profile_stats(self.user.id)
+        self.assertEqual(stats['tests_passed'], 2)
+        self.assertEqual(stats['average_percentage'], 50)
+
+        PassedTests.objects.filter(passed_test=self.tests[1]).delete()
+        self.assertEqual(profile_stats(self.user.id)['average_percentage'],
+                         100)
+
+    def test_stats_not_cached_before_the_result(self):
+        def read_profile(*args, **kwargs):
+            # a profile request between the attempt and the result
+            profile_stats(self.user.id)
+
+        with mock.patch('tests.signals.record_score', read_profile):
+            save_result(self.user, self.tests[0].id, 5, 5)
+        self.assertEqual(profile_stats(self.user.id)['tests_passed'], 1)
+
+    def test_results_paged(self):
+        for test in self.tests:
+            save_result(self.user, test.id, 4, 5)
+        with mock.patch('tests.profiles.PROFILE_PAGE_SIZE', 2):
+            first = profile_results_page(self.user.id, 1)
+            last = profile_results_page(self.user.id, 2)
+            self.assertEqual(
+                profile_results_page(self.user.id, 'x').number, 1)
+        self.assertEqual(
+            [result.passed_test for result in first.object_list]
+            + [result.passed_test for result in last.object_list],
+            self.tests)
+        self.assertTrue(first.has_next())
+        self.assertFalse(last.has_next())
+        self.assertEqual(last.object_list[0].score, 80)
+
+
+class TransferTests(TestCase):
+    """
+    Tests survive an export / import round trip in both formats,
+    malformed records are rejected with their number
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = TestsUser.objects.create(username='author')
+        cls.importer = TestsUser.objects.create(
+            username='importer', is_staff=True, is_superuser=True)
+        create_test(cls.author, title='first, "quoted"')
+        create_test(cls.author, title='second', questions=2, draft=True)
+
+    def exported(self, author):
+        records = list(export_records(Test.objects.filter(author=author)))
+        for record in records:
+            del record['id']
+        return records
+
+    def round_trip(self, file_format, batch_size):
+        lines, _ = EXPORT_FORMATS[file_format]
+        text = ''.join(lines(export_records(Test.objects.all())))
+        records = IMPORT_READERS[file_format](io.StringIO(text, newline=''))
+        return import_records(records, self.importer, batch_size)
+
+    def test_round_trip(self):
+        for file_format in EXPORT_FORMATS:
+            with self.subTest(file_format=file_format):
+                self.assertEqual(self.round_trip(file_format, 1), (2, 7))
+                self.assertEqual(self.exported(self.importer),
+                                 self.exported(self.author))
+                Test.objects.filter(author=self.importer).delete()
+
+    def record(self, title, right_answer=1):
+        return {'title': title, 'questions': [{
+            'text': 'q', 'answer_one': '1', 'answer_two': '2',
+            'answer_three': '3', 'answer_four': '4',
+            'right_answer': right_answer}]}
+
+    def test_batches_before_an_error_stay(self):
+        records = [self.record('a'), self.record('b'), self.record('c', 5)]
+        with self.assertRaisesMessage(
+                TransferError, 'record 3, question 1: right_answer'):
+            import_records(records, self.importer, batch_size=2)
+        self.assertEqual(
+            sorted(Test.objects.filter(author=self.importer)
+                   .values_list('title', flat=True)), ['a', 'b'])
+        self.assertFalse(Question.objects.filter(right_answer=5).exists())
+
+    def test_malformed_records(self):
+        cases = [
+            ([self.record('a', 0)], 'record 1, question 1: right_answer'),
+            ([self.record('a', 'one')], 'record 1, question 1'),
+            ([{'questions': []}], 'record 1: no title'),
+            ([{'title': 'a', 'created_at': 'yesterday'}],
+             'record 1: created_at'),
+            ([{'title': 'a', 'questions': [{'text': 'q'}]}],
+             'record 1, question 1: no answer_one'),
+            ([self.record('a' * 121)],
+             'record 1: title is longer than 120 characters'),
+            ([{'title': 'a', 'questions': [
+                dict(self.record('a')['questions'][0], answer_two='2' * 461)
+            ]}], 'record 1, question 1: answer_two is longer than 460'),
+            ([{'title': 'a', 'created_at': 20200101}],
+             'record 1: created_at 20200101 is not a date and time'),
+            ([{'title': 'a', 'draft': 'no'}],
+             "record 1: draft must be true or false, got 'no'"),
+            ([{'title': 'a', 'questions': {}}],
+             'record 1: questions must be a list'),
+        ]
+        for records, message in cases:
+            with self.subTest(message=message):
+                with self.assertRaisesMessage(TransferError, message):
+                    import_records(records, self.importer)
+        with self.assertRaisesMessage(TransferError, 'line 2'):
+            list(IMPORT_READERS['ndjson'](io.StringIO('{}\n{"title"\n')))
+        with self.assertRaisesMessage(TransferError, 'no test column'):
+            list(IMPORT_READERS['csv'](io.StringIO('title,text\na,q\n')))
+        self.assertFalse(Test.objects.filter(author=self.importer).exists())
+
+    def test_admin_import(self):
+        self.client.force_login(self.importer)
+        url = reverse('admin:tests_test_import')
+        upload = SimpleUploadedFile(
+            'tests.ndjson', json.dumps(self.record('uploaded')).encode())
+        response = self.client.post(url, {'file': upload})
+        self.assertRedirects(response, reverse('admin:tests_test_changelist'))
+        self.assertTrue(Test.objects.filter(
+            author=self.importer, title='uploaded').exists())
+
+        upload = SimpleUploadedFile(
+            'tests.ndjson', json.dumps(self.record('bad', 7)).encode())
+        self.assertContains(self.client.post(url, {'file': upload}),
+                            'right_answer must be one of')
+
+        upload = SimpleUploadedFile('tests.csv', b'title,text\na,q\n')
+        self.assertContains(self.client.post(url, {'file': upload}),
+                            'no test column')
+        upload = SimpleUploadedFile(
+            'tests.ndjson', json.dumps(self.record('a' * 200)).encode())
+        self.assertContains(self.client.post(url, {'file': upload}),
+                            'title is longer than 120 characters')
+
+
+class SearchTests(TestCase):
+    """
+    SQLite FTS5 matches are filtered before the search limit,
+    saves that leave the searched text alone are not reindexed
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = TestsUser.objects.create(username='author')
+        cls.drafts = [create_test(cls.author, title=f'algebra algebra {i}',
+                                  draft=True) for i in range(3)]
+        cls.published = create_test(cls.author, title='algebra basics')
+
+    @mock.patch('tests.search.TESTS_SEARCH_LIMIT', 2)
+    def test_filters_apply_before_the_limit(self):
+        # the drafts rank first, their titles match twice
+        found = search_tests(Test.objects.filter(draft=False), 'algebra')
+        self.assertEqual(list(found), [self.published])
+        found = search_tests(Test.objects.filter(draft=True), 'algebra')
+        self.assertEqual(found.count(), 2)
+
+    def test_reindex_only_searched_fields(self):
+        with mock.patch('tests.signals.index_tests') as index:
+            self.published.save(update_fields=['draft'])
+            Question.objects.filter(test=self.published).first() \
+                .save(update_fields=['right_answer'])
+            index.assert_not_called()
+            self.published.save(update_fields=['title'])
+            self.published.save()
+            self.assertEqual(index.call_count, 2)
+
+
+class CounterTests(TestCase):
+    """
+    Test.question_count and pass_count follow their rows,
+    rebuild_test_counters repairs drifted ones
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = TestsUser.objects.create(username='author')
+        cls.user = TestsUser.objects.create(username='student')
+
+    def counters(self, test):
+        return Test.objects.values_list(
+            'question_count', 'pass_count').get(id=test.id)
+
+    def test_signals_shift_counters(self):
+        test = create_test(self.author)
+        self.assertEqual(self.counters(test), (5, 0))
+        save_result(self.user, test.id, 5, 5)
+        # a retake moves the result, it is not another pass
+        save_result(self.user, test.id, 4, 5)
+        self.assertEqual(self.counters(test), (5, 1))
+        test.test_questions.first().delete()
+        PassedTests.objects.filter(passed_test=test).delete()
+        self.assertEqual(self.counters(test), (4, 0))
+
+    def test_rebuild_fixes_drift(self):
+        test = create_test(self.author)
+        save_result(self.user, test.id, 5, 5)
+        # a published test needs MINIMUM_QUESTIONS, drop to draft first
+        Test.objects.filter(id=test.id).update(draft=True)
+        Question.objects.filter(test=test).first().delete()
+        Test.objects.filter(id=test.id).update(
+            question_count=40, pass_count=7)
+        out = io.StringIO()
+
+        call_command('rebuild_test_counters', '--dry-run', stdout=out)
+        self.assertIn('Found 1 drifted', out.getvalue())
+        self.assertEqual(self.counters(test), (40, 7))
+
+        call_command('rebuild_test_counters', stdout=out)
+        self.assertEqual(self.counters(test), (4, 1))
+        self.assertTrue(Test.objects.get(id=test.id).draft)
+
+
+class GradingTests(TestCase):
+    """
+    Submissions are graded against the cached answer key,
+    answers to questions of another test are rejected
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestsUser.objects.create(username='student')
+        cls.test = create_test(cls.user)
+        cls.other = create_test(cls.user, title='other')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_right_answers(self):
+        key = get_answer_key(self.test.id)
+        first, second, *_ = sorted(key)
+        answers = {first: key[first], second: key[second] % 4 + 1}
+        self.assertEqual(grade(key, answers), 1)
+        self.assertEqual(grade(key, {}), 0)
+
+    def test_foreign_question_rejected(self):
+        key = get_answer_key(self.test.id)
+        foreign = self.other.test_questions.first()
+        with self.assertRaises(SuspiciousOperation):
+            grade(key, {foreign.id: foreign.right_answer})
+
+    def test_foreign_question_bad_request(self):
+        self.client.force_login(self.user)
+        foreign = self.other.test_questions.first()
+        response = self.client.post(reverse('tests:test_check'), {
+            'test_id': self.test.id,
+            str(foreign.id): str(foreign.right_answer),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PassedTests.objects.exists())
+
+    def test_retakes_keep_the_history(self):
+        for right_answers_count in (4, 2, 3):
+            save_result(self.user, self.test.id, right_answers_count, 5)
+        result = PassedTests.objects.get(
+            tests_user=self.user, passed_test=self.test)
+        attempts = TestAttempt.objects.filter(
+            tests_user=self.user, passed_test=self.test).order_by('id')
+        self.assertEqual(
+            list(attempts.values_list('right_answers_count', flat=True)),
+            [4, 2, 3])
+        self.assertEqual(result.latest_attempt, attempts.last())
+        self.assertEqual(result.right_answers_count, 3)
+        self.assertEqual(result.attempts_count, 3)
+        self.assertEqual(result.best_percentage, 80)
+
+    def test_migrations_link_and_recount_attempts(self):
+        seed = import_module('tests.migrations.0016_test_attempts')
+        dedupe = import_module('tests.migrations.0018_passedtests_unique')
+        other = TestsUser.objects.create(username='other')
+        results = [
+            PassedTests.objects.create(
+                tests_user=tests_user, passed_test=self.test,
+                right_answers_count=right_answers_count, question_count=5)
+            for tests_user, right_answers_count in ((self.user, 2), (other, 4))
+        ]
+        seed.seed_attempts(apps, None)
+        for result in results:
+            result.refresh_from_db()
+            self.assertEqual(result.latest_attempt.tests_user,
+                             result.tests_user)
+            self.assertEqual(result.best_percentage,
+                             result.right_answers_count * 20)
+
+        # the attempt of a dropped duplicate stays in the history
+        TestAttempt.objects.create(
+            tests_user=self.user, passed_test=self.test,
+            right_answers_count=5, question_count=5)
+        dedupe.recount_attempts(apps, [self.test.id])
+        results[0].refresh_from_db()
+        self.assertEqual(results[0].attempts_count, 2)
+        self.assertEqual(results[0].best_percentage, 100)
+        results[1].refresh_from_db()
+        self.assertEqual(results[1].attempts_count, 1)
+        self.assertEqual(results[1].best_percentage, 80)
+
+
+class CacheStatsTests(TestCase):
+    """
+    cached() counts a miss per build and a hit per cached read
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(CACHE_STATS.pop, 'test_stats', None)
+
+    def test_hits_and_misses(self):
+        build = mock.Mock(return_value='value')
+        for _ in range(3):
+            self.assertEqual(
+                cached('test_stats', 'stats:key', build, None), 'value')
+        cache.delete('stats:key')
+        cached('test_stats', 'stats:key', build, None)
+        self.assertEqual(build.call_count, 2)
+        self.assertEqual(
+            cache_stats()['test_stats'],
+            {'hits': 2, 'misses': 2, 'ratio': 0.5})
+
+    def test_empty_ratio(self):
+        self.assertEqual(get_stats('test_stats').ratio, 0.0)
+
+    def test_bumped_version_misses(self):
+        build = mock.Mock(return_value='value')
+        for _ in range(2):
+            version = get_version('stats', 1)
+            cached('test_stats', f'stats:1:{version}', build, None)
+            bump_version('stats', 1)
+        self.assertEqual(get_stats('test_stats').as_dict(),
+                         {'hits': 0, 'misses': 2, 'ratio': 0.0})
+
+
+class CursorPaginatorTests(TestCase):
+    """
+    Cursor pages cover every row once in both directions,
+    rows with the same ordering value are ordered by id
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestsUser.objects.create(username='reader')
+        cls.test = create_test(cls.user)
+        Comment.objects.bulk_create(
+            Comment(test=cls.test, user=cls.user, text=f'comment {i}')
+            for i in range(7)
+        )
+        # ties: the first four comments share their date
+        comments = Comment.objects.order_by('id')
+        tied = comments.first().created_at
+        Comment.objects.filter(
+            id__in=comments.values_list('id', flat=True)[:4]
+        ).update(created_at=tied)
+
+    def paginator(self, ordering='created_at', per_page=3):
+        return CursorPaginator(
+            Comment.objects.filter(test=self.test), per_page, ordering)
+
+    def expected(self, ordering):
+        prefix = '-' if ordering.startswith('-') else ''
+        return list(Comment.objects.order_by(ordering, f'{prefix}id')
+                    .values_list('id', flat=True))
+
+    def walk(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return pages
+
+    def test_forward_and_back(self):
+        for ordering in ('created_at', '-created_at'):
+            paginator = self.paginator(ordering)
+            pages = self.walk(paginator)
+            self.assertEqual(
+                [c.id for page in pages for c in page],
+                self.expected(ordering))
+            self.assertEqual([len(page) for page in pages], [3, 3, 1])
+            self.assertFalse(pages[0].has_previous())
+
+            back = [pages[-1]]
+            while back[-1].has_previous():
+                back.append(paginator.page(back[-1].previous_cursor))
+            self.assertEqual(
+                [[c.id for c in page] for page in reversed(back)],
+                [[c.id for c in page] for page in pages])
+
+    def test_exact_last_page(self):
+        pages = self.walk(self.paginator(per_page=7))
+        self.assertEqual(len(pages), 1)
+        self.assertFalse(pages[0].has_other_pages())
+
+    def test_past_the_end(self):
+        paginator = self.paginator()
+        last = list(Comment.objects.order_by('created_at', 'id'))[-1]
+        page = paginator.page(paginator.encode(last, paginator.NEXT))
+        self.assertEqual(len(page), 0)
+        self.assertFalse(page.has_other_pages())
+
+    def test_broken_cursor_starts_over(self):
+        paginator = self.paginator()
+        first = [c.id for c in paginator.page()]
+        for cursor in ('garbage', 'W10', paginator.encode(
+                Comment.objects.first(), 'x')):
+            self.assertEqual([c.id for c in paginator.page(cursor)], first)
+
+
+class PassedFilterTests(TestCase):
+    """
+    passed_by / unmatched_by split the tests by one user results
+    with an EXISTS, other users results add no rows;
+    bench_passed_filter compares them with the NOT IN / JOIN filters
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestsUser.objects.create(username='student')
+        cls.other = TestsUser.objects.create(username='other')
+        cls.passed, cls.both, cls.fresh = (
+            create_test(cls.user, title=title)
+            for title in ('passed', 'both', 'fresh'))
+        for user, test in ((cls.user, cls.passed), (cls.user, cls.both),
+                           (cls.other, cls.both), (cls.other, cls.fresh)):
+            PassedTests.objects.create(
+                tests_user=user, passed_test=test,
+                right_answers_count=3, question_count=5)
+
+    def titles(self, queryset):
+        return sorted(queryset.values_list('title', flat=True))
+
+    def test_split(self):
+        self.assertEqual(self.titles(Test.objects.passed_by(self.user)),
+                         ['both', 'passed'])
+        self.assertEqual(self.titles(Test.objects.unmatched_by(self.user)),
+                         ['fresh'])
+
+    def test_exists_without_join(self):
+        sql = str(Test.objects.unmatched_by(self.user).query).upper()
+        self.assertIn('NOT EXISTS', sql)
+        self.assertNotIn('JOIN', sql)
+
+    def test_list_filter(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('tests:tests'),
+                                   {'passed': 'unmatched'})
+        self.assertEqual(
+            [test.title for test in response.context['object_list']],
+            ['fresh'])
+
+    def test_benchmark(self):
+        counts = []
+
+        def measure(queryset, repeat):
+            counts.append(queryset.count())
+            return 1.0
+
+        out = io.StringIO()
+        with mock.patch('tests.management.commands.bench_passed_filter'
+                        '.Command.measure', side_effect=measure):
+            call_command('bench_passed_filter', passes=[1, 3], tests=5,
+                         repeat=1, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+        # user with 3 passes: NOT IN / NOT EXISTS leave 2 bench tests
+        # and the 3 of the class, IN / EXISTS find the 3 passed
+        self.assertEqual(counts[4:], [5, 5, 3, 3])
+        self.assertFalse(TestsUser.objects.filter(
+            username__startswith='bench_passed'))
+
+
+class ConnectionHealthTests(TestCase):
+    """
+    check_connections pings only connections idle for longer than
+    DB_HEALTH_CHECK_INTERVAL and closes the dead ones
+    """
+
+    def check(self, *connections, now):
+        with mock.patch('tests.db.connections') as handler, \
+                mock.patch('tests.db.time.monotonic', return_value=now):
+            handler.all.return_value = connections
+            check_connections()
+
+    def db_connection(self, last_request_at, usable=True, closed=False):
+        db = mock.Mock(spec=['connection', 'last_request_at',
+                             'is_usable', 'close'])
+        db.connection = None if closed else object()
+        db.last_request_at = last_request_at
+        db.is_usable.return_value = usable
+        return db
+
+    def test_idle_dead_connection_closed(self):
+        db = self.db_connection(0, usable=False)
+        self.check(db, now=DB_HEALTH_CHECK_INTERVAL + 1)
+        db.close.assert_called_once_with()
+        self.assertEqual(db.last_request_at, DB_HEALTH_CHECK_INTERVAL + 1)
+
+    def test_idle_live_connection_kept(self):
+        db = self.db_connection(0)
+        self.check(db, now=DB_HEALTH_CHECK_INTERVAL + 1)
+        db.is_usable.assert_called_once_with()
+        db.close.assert_not_called()
+
+    def test_recent_connection_not_pinged(self):
+        db = self.db_connection(0, usable=False)
+        self.check(db, now=DB_HEALTH_CHECK_INTERVAL - 1)
+        db.is_usable.assert_not_called()
+        db.close.assert_not_called()
+
+    def test_closed_connection_skipped(self):
+        db = self.db_connection(0, usable=False, closed=True)
+        self.check(db, now=DB_HEALTH_CHECK_INTERVAL + 1)
+        db.is_usable.assert_not_called()
+        self.assertEqual(db.last_request_at, 0)
+
+    def test_first_request_not_pinged(self):
+        db = mock.Mock(spec=['connection', 'is_usable', 'close'])
+        self.check(db, now=1000)
+        db.is_usable.assert_not_called()
+        self.assertEqual(db.last_request_at, 1000)
+
+
+class RequestStatsTests(TestCase):
+    """
+    RequestStatsMiddleware records queries and template time per view,
+    metrics summarize the rolling window
+    """
+
+    def setUp(self):
+        REQUEST_STATS.reset()
+        self.addCleanup(REQUEST_STATS.reset)
+        self.factory = RequestFactory()
+
+    def run_view(self, view):
+        request = self.factory.get('/')
+        request.resolver_match = None
+        return RequestStatsMiddleware(view)(request)
+
+    def test_fragments_timed(self):
+        def view(request):
+            TestsUser.objects.count()
+            TestsUser.objects.count()
+            return HttpResponse(render_to_string('tests_table.html', {}))
+
+        response = self.run_view(view)
+        sample = REQUEST_STATS.views['unresolved'].samples[0]
+        self.assertGreater(sample['template_ms'], 0)
+        self.assertEqual((sample['queries'], sample['repeated']), (2, 1))
+        self.assertIn('COUNT(', sample['repeated_sql'].upper())
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+    def test_includes_counted_once(self):
+        recorder = TemplateRecorder()
+        include = mock.Mock(return_value='include')
+
+        def page(template, context):
+            return recorder(include, template, context)
+
+        with mock.patch('tests.middleware.time.perf_counter',
+                        side_effect=[0, 1, 5]):
+            recorder(page, None, None)
+        self.assertEqual(recorder.duration, 5)
+
+    def test_no_timing_outside_requests(self):
+        self.run_view(lambda request: HttpResponse())
+        with mock.patch.object(TemplateRecorder, '__call__') as record:
+            render_to_string('tests_table.html', {})
+        record.assert_not_called()
+
+    def test_stats_view(self):
+        staff = TestsUser.objects.create(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        middleware = ['tests.middleware.RequestStatsMiddleware',
+                      *settings.MIDDLEWARE]
+        with override_settings(MIDDLEWARE=middleware):
+            self.client.get(reverse('tests:tests'))
+            response = self.client.get(reverse('tests:request_stats'))
+        self.assertIn('Server-Timing', response)
+        summary = response.json()['views']['tests:tests']
+        self.assertEqual(summary['requests'], 1)
+        self.assertGreater(summary['template_ms']['max'], 0)
+
+    def test_summary(self):
+        self.assertEqual(percentile_summary([]), {
+            'count': 0, 'p50': 0, 'p95': 0, 'p99': 0, 'max': 0})
+        self.assertEqual(percentile_summary([7])['p99'], 7)
+        summary = percentile_summary(list(range(1, 101)))
+        self.assertEqual((summary['p50'], summary['max']), (50.5, 100))
+        self.assertEqual(
+            histogram([1, 5, 6, 3000]),
+            {'<=5': 2, '<=10': 1, '<=25': 0, '<=50': 0, '<=100': 0,
+             '<=250': 0, '<=500': 0, '<=1000': 0, '<=2500': 0, '>2500': 1})
+
+    def test_window(self):
+        stats = RequestStats(window=2)
+        for queries in (9, 1, 2):
+            stats.record('view', {
+                'total_ms': 1, 'db_ms': 1, 'template_ms': 1,
+                'queries': queries, 'repeated': 0, 'repeated_sql': ''})
+        summary = stats.summary()['view']
+        self.assertEqual(summary['requests'], 3)
+        self.assertEqual(summary['queries']['max'], 2)
+
+
+class SeedPlatformTests(TestCase):
+    """
+    seed_platform fills every stored field the views read
+    """
+
+    def test_seeded_results(self):
+        call_command('seed_platform', users=5, tests=3, questions=4,
+                     passes=30, comments=5, stdout=io.StringIO())
+        results = PassedTests.objects.select_related('latest_attempt')
+        self.assertTrue(results)
+        key = dict(Question.objects.values_list('id', 'right_answer'))
+        for result in results:
+            attempt = result.latest_attempt
+            self.assertAlmostEqual(result.score, result.percentage)
+            self.assertEqual(attempt.right_answers_count,
+                             result.right_answers_count)
+            ids = struct.unpack(f'<{attempt.question_count}I',
+                                attempt.question_ids)
+            self.assertEqual(
+                sum(key[q] == a for q, a in zip(ids, attempt.answers)),
+                result.right_answers_count)
+        self.assertEqual(
+            UserScore.objects.count(),
+            results.values('tests_user').distinct().count())
+        self.assertAlmostEqual(
+            sum(UserScore.objects.values_list('total_score', flat=True)),
+            sum(results.values_list('score', flat=True)))
+
+    def test_seeded_prefix_refused(self):
+        options = dict(users=3, tests=2, questions=2, passes=5, comments=1,
+                       stdout=io.StringIO())
+        call_command('seed_platform', **options)
+        counts = TestsUser.objects.count(), Test.objects.count()
+        with self.assertRaisesMessage(CommandError, 'already seeded'):
+            call_command('seed_platform', **options)
+        self.assertEqual(
+            (TestsUser.objects.count(), Test.objects.count()), counts)
+        call_command('seed_platform', prefix='other', **options)
+        self.assertEqual(TestsUser.objects.count(), counts[0] + 3)
+
+
+class QueryPlanTests(TestCase):
+    """
+    The hot queries run on the composite indexes,
+    check_query_plans fails when one of them is missing
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = TestsUser.objects.create(username='student')
+        cls.test = create_test(cls.user)
+
+    def test_plans_use_indexes(self):
+        out = io.StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertNotIn('SEQ SCAN', out.getvalue())
+
+    def test_missing_index_flagged(self):
+        with connection.cursor() as cursor:
+            for index in ('test_published_created_idx',
+                          'test_draft_created_idx'):
+                cursor.execute(f'DROP INDEX {index}')
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_query_plans', stdout=out)
+        self.assertIn('SEQ SCAN tests list, old first', out.getvalue())
+        self.assertIn('ok       my tests', out.getvalue())
+
+    def test_one_result_per_user_and_test(self):
+        PassedTests.objects.create(
+            tests_user=self.user, passed_test=self.test,
+            right_answers_count=1, question_count=5)
+        with self.assertRaises(IntegrityError):
+            PassedTests.objects.create(
+                tests_user=self.user, passed_test=self.test,
+                right_answers_count=2, question_count=5)
@@ -0,0 +1,99 @@
+"""
+Square avatar renditions, made with Pillow on upload or on first use
+and kept on the media storage next to the originals
+"""
+import hashlib
+import io
+from functools import lru_cache
+from pathlib import PurePosixPath
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, features
+
+from django_tests_mini_platform.settings import AVATAR_SIZES, \
+    AVATAR_MAX_UPLOAD_SIZE, AVATAR_MAX_DIMENSION, AVATAR_FORMAT, \
+    AVATAR_QUALITY
+
+DEFAULT_AVATAR = 'default_avatar.png'
+THUMBNAILS_DIR = 'thumbs'
+THUMBNAIL_FORMAT = AVATAR_FORMAT if features.check(
+    AVATAR_FORMAT.lower()) else 'JPEG'
+
+
+def validate_avatar(file):
+    """
+    Reject new avatars over AVATAR_MAX_UPLOAD_SIZE bytes
+    or AVATAR_MAX_DIMENSION pixels a side, before decoding them
+    """
+    if getattr(file, '_committed', False):
+        # already stored, checked on upload
+        return
+    if file.size > AVATAR_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            f'Avatar is larger than {filesizeformat(AVATAR_MAX_UPLOAD_SIZE)}')
+    try:
+        width, height = Image.open(file).size
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Avatar is not an image')
+    finally:
+        file.seek(0)
+    if max(width, height) > AVATAR_MAX_DIMENSION:
+        raise ValidationError(
+            f'Avatar is larger than {AVATAR_MAX_DIMENSION}px a side')
+
+
+def thumbnail_name(name, size):
+    """ thumbs/<size>/<stem>-<hash of the original name>.<format> """
+    path = PurePosixPath(name)
+    digest = hashlib.md5(name.encode()).hexdigest()[:8]
+    extension = 'jpg' if THUMBNAIL_FORMAT == 'JPEG' else \
+        THUMBNAIL_FORMAT.lower()
+    return f'{THUMBNAILS_DIR}/{size}/{path.stem}-{digest}.{extension}'
+
+
+def make_thumbnail(name, size):
+    """
+    Crop the original to a size x size square and store it,
+    returns the thumbnail name
+    """
+    pixels = AVATAR_SIZES[size]
+    with default_storage.open(name) as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+    if THUMBNAIL_FORMAT == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB' if THUMBNAIL_FORMAT == 'JPEG' else 'RGBA')
+
+    buffer = io.BytesIO()
+    image.save(buffer, THUMBNAIL_FORMAT, quality=AVATAR_QUALITY)
+    thumbnail = thumbnail_name(name, size)
+    default_storage.delete(thumbnail)
+    default_storage.save(thumbnail, ContentFile(buffer.getvalue()))
+    return thumbnail
+
+
+def make_thumbnails(name):
+    """ every AVATAR_SIZES rendition of an uploaded avatar """
+    for size in AVATAR_SIZES:
+        make_thumbnail(name, size)
+    avatar_url.cache_clear()
+
+
+@lru_cache(maxsize=4096)
+def avatar_url(name, size='small'):
+    """
+    URL of the avatar rendition, made on first use.
+    A missing or broken original falls back to the default avatar.
+    """
+    name = str(name or DEFAULT_AVATAR)
+    thumbnail = thumbnail_name(name, size)
+    if not default_storage.exists(thumbnail):
+        try:
+            make_thumbnail(name, size)
+        except OSError:
+            if name == DEFAULT_AVATAR:
+                return default_storage.url(DEFAULT_AVATAR)
+            return avatar_url(DEFAULT_AVATAR, size)
+    return default_storage.url(thumbnail)
@@ -0,0 +1,259 @@
+"""
+Streaming import / export of tests with their questions.
+
+A record has the shape of tests_data in the seeding migration:
+{"title": .., "description": .., "draft": .., "created_at": ..,
+ "questions": [{"text": .., "answer_one": .., ..., "right_answer": ..}]}
+NDJSON holds one record per line, CSV one question per row
+with the test columns repeated and grouped by the "test" column.
+Malformed input raises TransferError naming the record (line of
+NDJSON, test group of CSV) and question, counted from 1.
+"""
+import csv
+import itertools
+import json
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from tests.cache import bump_version
+from tests.catalogue import CATALOGUE_VERSION, CATALOGUE_ID
+from tests.models import Test, Question
+from tests.search import index_tests
+
+TEST_FIELDS = ['title', 'description', 'draft', 'created_at']
+QUESTION_FIELDS = ['text', 'answer_one', 'answer_two', 'answer_three',
+                   'answer_four', 'right_answer']
+CSV_FIELDS = ['test'] + TEST_FIELDS + QUESTION_FIELDS
+RIGHT_ANSWERS = [choice.value for choice in Question.RightAnswer]
+
+
+class TransferError(ValueError):
+    pass
+
+
+# export
+
+def export_records(queryset, chunk_size=2000):
+    """
+    Records of the queryset tests, read with two server-side cursors
+    (tests and questions, both ordered by test id) merged on the fly
+    """
+    tests = queryset.order_by('id').values('id', *TEST_FIELDS) \
+        .iterator(chunk_size=chunk_size)
+    questions = Question.objects.filter(test__in=queryset.values('id')) \
+        .order_by('test_id', 'id').values('test_id', *QUESTION_FIELDS) \
+        .iterator(chunk_size=chunk_size)
+    question = next(questions, None)
+
+    for test in tests:
+        test['questions'] = []
+        while question is not None and question['test_id'] <= test['id']:
+            if question['test_id'] == test['id']:
+                del question['test_id']
+                test['questions'].append(question)
+            question = next(questions, None)
+        test['created_at'] = test['created_at'].isoformat()
+        yield test
+
+
+def ndjson_lines(records):
+    for record in records:
+        record.pop('id', None)
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """ File-like object handing back what csv.writer writes """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for record in records:
+        test = [record['id']] + [record[field] for field in TEST_FIELDS]
+        if not record['questions']:
+            yield writer.writerow(test + [''] * len(QUESTION_FIELDS))
+        for question in record['questions']:
+            yield writer.writerow(
+                test + [question[field] for field in QUESTION_FIELDS])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
+
+
+# import
+
+def read_ndjson(stream):
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise TransferError(f'line {number}: {error}')
+
+
+def read_csv(stream):
+    rows = csv.DictReader(stream)
+    try:
+        missing = [field for field in ('test', 'title')
+                   if field not in (rows.fieldnames or [])]
+        if missing:
+            raise TransferError(f'line 1: no {", ".join(missing)} column')
+        for _, group in itertools.groupby(rows, key=lambda row: row['test']):
+            group = list(group)
+            record = {field: group[0].get(field) for field in TEST_FIELDS}
+            record['questions'] = [
+                {field: row.get(field) for field in QUESTION_FIELDS}
+                for row in group if row.get('text')
+            ]
+            yield record
+    except csv.Error as error:
+        raise TransferError(f'line {rows.line_num}: {error}')
+
+
+IMPORT_READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+TRUE_VALUES = (True, 'True', 'true', '1')
+FALSE_VALUES = (False, 'False', 'false', '0')
+
+
+def text_field(data, model, field, required=True):
+    """
+    data[field] as a string that fits the model field,
+    '' for a missing optional one
+    """
+    value = data.get(field)
+    if value in (None, ''):
+        if required:
+            raise ValueError(f'no {field}')
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f'{field} must be a string, got {value!r}')
+    max_length = model._meta.get_field(field).max_length
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{field} is longer than {max_length} characters')
+    return value
+
+
+def parse_draft(value):
+    """ NDJSON booleans and CSV True / False, a missing one is draft """
+    if value in (None, ''):
+        return True
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'draft must be true or false, got {value!r}')
+
+
+def build_test(record, author):
+    if not isinstance(record, dict):
+        raise ValueError('not an object')
+    created_at = record.get('created_at')
+    if created_at in (None, ''):
+        created_at = timezone.now()
+    elif not isinstance(created_at, str) \
+            or parse_datetime(created_at) is None:
+        raise ValueError(f'created_at {created_at!r} '
+                         f'is not a date and time')
+    else:
+        created_at = parse_datetime(created_at)
+    questions = record.get('questions')
+    if questions is None:
+        questions = []
+    elif not isinstance(questions, list):
+        raise ValueError('questions must be a list')
+    return Test(
+        title=text_field(record, Test, 'title'),
+        description=text_field(record, Test, 'description', False),
+        draft=parse_draft(record.get('draft')),
+        created_at=created_at,
+        author=author,
+        question_count=len(questions),
+    )
+
+
+def build_question(data, test):
+    if not isinstance(data, dict):
+        raise ValueError('not an object')
+    missing = [field for field in QUESTION_FIELDS
+               if data.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f'no {", ".join(missing)}')
+    right_answer = str(data['right_answer'])
+    if isinstance(data['right_answer'], bool) or not right_answer.isdigit() \
+            or int(right_answer) not in RIGHT_ANSWERS:
+        raise ValueError(f'right_answer must be one of {RIGHT_ANSWERS}, '
+                         f'got {data["right_answer"]!r}')
+    return Question(
+        test=test,
+        right_answer=int(right_answer),
+        **{field: text_field(data, Question, field)
+           for field in QUESTION_FIELDS[:-1]}
+    )
+
+
+def build_batch(batch, first_number, author):
+    """
+    (tests, questions) of a batch of records, validated before
+    anything is written
+    """
+    tests, questions = [], []
+    for number, record in enumerate(batch, start=first_number):
+        try:
+            test = build_test(record, author)
+        except ValueError as error:
+            raise TransferError(f'record {number}: {error}')
+        tests.append(test)
+        for index, data in enumerate(record.get('questions') or [], 1):
+            try:
+                questions.append(build_question(data, test))
+            except ValueError as error:
+                raise TransferError(
+                    f'record {number}, question {index}: {error}')
+    return tests, questions
+
+
+def import_records(records, author, batch_size=500):
+    """
+    Create tests and questions with bulk_create,
+    one transaction per batch of batch_size tests.
+    Returns (tests, questions) created.
+    A TransferError stops the import, the batches before it stay.
+    """
+    tests_total = questions_total = 0
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            return tests_total, questions_total
+
+        tests, questions = build_batch(batch, tests_total + 1, author)
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Test.objects.bulk_create(tests)
+            else:
+                # no RETURNING: ids come from single inserts
+                for test in tests:
+                    test.save()
+            # questions were built before their tests had ids
+            for question in questions:
+                question.test_id = question.test.id
+            Question.objects.bulk_create(questions, batch_size=batch_size)
+            index_tests([test.id for test in tests])
+        # bulk_create sends no signals
+        bump_version(CATALOGUE_VERSION, CATALOGUE_ID)
+
+        tests_total += len(tests)
+        questions_total += len(questions)
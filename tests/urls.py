@@ -1,9 +1,11 @@
 from django.urls import path, include
 
+from tests import async_views
 from tests.views import UserLogin, UserLogout, Register, TestsView, \
     TestUpdateView, CreateTestView, UserDetailView, MyTestsView, \
     QuestionCreateView, DeleteQuestionView, TestDetailView, CommentCreateView, \
-    TestPassView, TestCheckView
+    TestPassView, TestCheckView, CommentFeedView, RequestStatsView, \
+    TestLeaderboardView, LeaderboardView
 
 app_name = 'tests'
 urlpatterns = [
@@ -12,15 +14,26 @@ urlpatterns = [
     path('accounts/register/', Register.as_view(), name="register"),
     path('profile/<int:pk>/', UserDetailView.as_view(), name="profile"),
     path('comment/', CommentCreateView.as_view(), name="comment"),
+    path('comment/<int:pk>/feed/', CommentFeedView.as_view(),
+         name="comment_feed"),
     path('', TestsView.as_view(), name="tests"),
     path('mytests/', MyTestsView.as_view(), name="my_tests"),
     path('test_edit/<int:pk>/', TestUpdateView.as_view(), name="test_edit"),
     path('create_test/', CreateTestView.as_view(), name="create_test"),
     path('test/<int:pk>/', TestDetailView.as_view(), name='test_detail'),
+    path('test/<int:pk>/leaderboard/', TestLeaderboardView.as_view(),
+         name='test_leaderboard'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
     path('test_pass/<int:pk>/', TestPassView.as_view(), name='test_pass'),
     path('test_check/', TestCheckView.as_view(), name="test_check"),
     path('add_question/', QuestionCreateView.as_view(), name="add_question"),
     path('delete_question/<int:pk>/', DeleteQuestionView.as_view(),
          name='delete_question'),
+    path('stats/', RequestStatsView.as_view(), name='request_stats'),
+    path('async/test_check/', async_views.test_check,
+         name='test_check_async'),
+    path('async/comment/', async_views.comment_create, name='comment_async'),
+    path('api/test/<int:pk>/check/', async_views.api_test_check,
+         name='api_test_check'),
 
 ]
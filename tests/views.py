@@ -1,18 +1,32 @@
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView, LogoutView
 from django.db.models import Q
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect, JsonResponse
+from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
 from django.utils.decorators import method_decorator
 from django.views.generic import CreateView, ListView, UpdateView, \
-    DetailView, DeleteView
+    DetailView, DeleteView, View, TemplateView
 
 from django_tests_mini_platform.settings import DEFAULT_TESTS_ORDERING, \
-    TESTS_ORDERINGS, MINIMUM_QUESTIONS, HOME_URL_LITERAL, TEST_EDIT_LITERAL
+    TESTS_ORDERINGS, MINIMUM_QUESTIONS, HOME_URL_LITERAL, TEST_EDIT_LITERAL, \
+    TESTS_CURSOR_PAGINATION
+from tests.cache import cache_stats
+from tests.catalogue import is_shared, cached_catalogue
+from tests.comments import comment_page, first_comment_page
 from tests.forms import SignUpForm, CreateTestForm, CreateQuestionForm, \
     CreateCommentForm, TestPassForm, SearchBoxForm
+from tests.grading import grade_submission, new_attempt, attempt_blocks
+from tests.item_analysis import item_analysis
+from tests.leaderboards import test_leaderboard, test_rank, \
+    global_leaderboard, global_rank
+from tests.metrics import REQUEST_STATS
 from tests.models import Test, TestsUser, Question, Comment, PassedTests
+from tests.pagination import CursorPaginator
+from tests.profiles import profile_results_page, profile_stats
+from tests.search import search_tests
 
 
 class UserLogin(LoginView):
@@ -45,9 +59,14 @@ class UserDetailView(DetailView):
     # Add  to context
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(object_list=object_list, **kwargs)
-        test_pass_records = PassedTests.objects.filter(tests_user=self.object)
+        page = profile_results_page(
+            self.object.id, self.request.GET.get('page'))
 
-        context.update({'test_pass_records': test_pass_records})
+        context.update({
+            'test_pass_records': page.object_list,
+            'page_obj': page,
+            'profile_stats': profile_stats(self.object.id),
+        })
         return context
 
 
@@ -60,34 +79,83 @@ class TestsView(ListView):
     paginate_by = 15
     template_name = 'tests.html'
 
-    queryset = Test.objects.all()
+    queryset = Test.objects.defer('search_vector')
     base_filter = Q(draft=False)
+    cursor_pagination = TESTS_CURSOR_PAGINATION
+    # the same for every user unless filtered by passed tests
+    shared_catalogue = True
+
+    def get(self, request, *args, **kwargs):
+        if not (self.shared_catalogue and is_shared(request.GET)):
+            return super().get(request, *args, **kwargs)
+
+        tests_table = cached_catalogue(
+            request.GET, self.cursor_pagination, self.render_tests_table)
+        # the rows are in tests_table, loaded on a cache miss only
+        self.object_list = self.queryset.none()
+        return self.render_to_response({
+            'view': self,
+            'tests_table': tests_table,
+            'search_form': SearchBoxForm,
+        })
+
+    def render_tests_table(self):
+        self.object_list = self.get_queryset()
+        return render_to_string(
+            'tests_table.html',
+            self.get_context_data(),
+            request=self.request,
+        )
 
     def get_queryset(self):
         search = self.request.GET.get('q')
         passed = self.request.GET.get('passed')
         query = self.base_filter
 
-        if search:
-            query &= Q(title__icontains=search)
-
-        if passed and passed in ['passed', 'unmatched']:
-            if passed == 'passed':
-                query &= Q(users_who_passed_test=self.request.user)
-            else:
-                query &= ~Q(users_who_passed_test=self.request.user)
-
         ordering = self.request.GET.get('ordering', DEFAULT_TESTS_ORDERING)
         # validate ordering
         if ordering not in TESTS_ORDERINGS:
             ordering = DEFAULT_TESTS_ORDERING
+        self.tests_ordering = ordering
+
+        queryset = self.queryset.filter(query)
+        if passed and passed in ['passed', 'unmatched']:
+            if passed == 'passed':
+                queryset = queryset.passed_by(self.request.user)
+            else:
+                queryset = queryset.unmatched_by(self.request.user)
 
-        return self.queryset.filter(query).order_by(ordering)
+        if search:
+            queryset = search_tests(queryset, search)
+            # best matches first, unless ordering was chosen explicitly
+            if 'ordering' not in self.request.GET \
+                    and not self.cursor_pagination:
+                return queryset.order_by('-search_rank', ordering)
+
+        return queryset.order_by(ordering)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.cursor_pagination:
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, page_size, self.tests_ordering)
+        page = paginator.page(self.request.GET.get('cursor'))
+        page.next_query = self.cursor_query(page.next_cursor)
+        page.previous_query = self.cursor_query(page.previous_cursor)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def cursor_query(self, cursor):
+        """ current GET params with another cursor """
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        params['cursor'] = cursor
+        return params.urlencode()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context.update({
             'search_form': SearchBoxForm,
+            'cursor_pagination': self.cursor_pagination,
         })
         return context
 
@@ -97,6 +165,7 @@ class MyTestsView(TestsView):
     """
     List of active user tests
     """
+    shared_catalogue = False
 
     def get_queryset(self):
         self.base_filter = Q(author=self.request.user)
@@ -110,18 +179,19 @@ class TestDetailView(DetailView):
     """
     model = Test
     template_name = 'test_detail.html'
+    queryset = Test.objects.select_related('author').defer('search_vector')
 
     # Add  to context
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(object_list=object_list, **kwargs)
-        users_who_passed_test = self.object.users_who_passed_test.all()
-        score_block = self.request.user in users_who_passed_test
+        # one lookup on the (tests_user, passed_test) unique index
+        user_test_record = PassedTests.objects.filter(
+            tests_user=self.request.user,
+            passed_test=self.object
+        ).first()
+        score_block = user_test_record is not None
 
         if score_block:
-            user_test_record = PassedTests.objects.get(
-                tests_user=self.request.user,
-                passed_test=self.object
-            )
             context.update({
                 'right_answers_count': user_test_record.right_answers_count,
                 'percentage': user_test_record.percentage,
@@ -129,12 +199,15 @@ class TestDetailView(DetailView):
 
             })
 
+        comments = first_comment_page(self.object.id)
         comment_form = CreateCommentForm(self.request.POST or None)
         comment_form.fields['text'].widget.attrs.update(
             {'class': 'form-control mr-3'})
         context.update({
             'add_comment_form': comment_form,
-            'score_block': score_block
+            'score_block': score_block,
+            'comments': comments['comments'],
+            'comments_next': comments['next'],
         })
         return context
 
@@ -147,14 +220,13 @@ class TestUpdateView(UpdateView):
     model = Test
     template_name = 'test_edit.html'
     success_url = reverse_lazy('tests:my_tests')
-    fields = ['title', 'description', 'created_at', 'draft']
+    fields = ['title', 'description', 'created_at', 'draft', 'pool_size']
 
     def form_valid(self, form):
         """If the form is valid, save the associated model."""
         test = self.object
         test.author = self.request.user
-        question_count = Question.objects.filter(test=test).count()
-        if question_count < MINIMUM_QUESTIONS and not test.draft:
+        if test.question_count < MINIMUM_QUESTIONS and not test.draft:
             alert_msg = f"this test doesnt have {MINIMUM_QUESTIONS} questions"
             messages.error(self.request, alert_msg)
             return HttpResponseRedirect(
@@ -165,7 +237,10 @@ class TestUpdateView(UpdateView):
     # Add  to context
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(object_list=object_list, **kwargs)
-        context.update({'add_question_form': CreateQuestionForm})
+        context.update({
+            'add_question_form': CreateQuestionForm,
+            'item_analysis': item_analysis(self.object.id),
+        })
         return context
 
 
@@ -244,21 +319,41 @@ class CommentCreateView(CreateView):
         return reverse('tests:test_detail', kwargs={'pk': test_id})
 
 
+@method_decorator(login_required, name='dispatch')
+class CommentFeedView(View):
+    """
+    Next page of test comments for "load more", as JSON
+    """
+
+    def get(self, request, pk):
+        cursor = request.GET.get('cursor')
+        if cursor:
+            page = comment_page(pk, cursor)
+        else:
+            page = first_comment_page(pk)
+        # only an empty page can belong to a missing test
+        if not page['comments'] and not Test.objects.filter(id=pk).exists():
+            raise Http404('No test found')
+        return JsonResponse(page)
+
+
 @method_decorator(login_required, name='dispatch')
 class TestPassView(DetailView):
     """
     Test page
     """
     model = Test
+    queryset = Test.objects.defer('search_vector')
     template_name = 'test_pass.html'
 
     # Add  to context
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(object_list=object_list, **kwargs)
-        questions = self.object.test_questions.all()
-        test_form = TestPassForm(questions=questions)
-
-        context.update({'test_form': test_form})
+        attempt, order = new_attempt(self.object)
+        context.update({
+            'attempt': attempt,
+            'question_blocks': attempt_blocks(self.object.id, order),
+        })
         return context
 
 
@@ -274,24 +369,66 @@ class TestCheckView(CreateView):
         return reverse('tests:test_detail', kwargs={'pk': test_id})
 
     def post(self, *args, **kwargs):
-        test = Test.objects.get(id=self.request.POST.get('test_id'))
-        question = test.test_questions.filter(test=test)
-        post_dict = self.request.POST.dict()
-        answers = {int(k): int(v) for k, v in post_dict.items() if k.isdigit()}
+        grade_submission(
+            self.request.user,
+            self.request.POST.get('test_id'),
+            self.request.POST.dict()
+        )
+        return HttpResponseRedirect(self.get_success_url())
 
-        right_answers_count = 0
-        for k, v in answers.items():
-            if v == question.get(id=k).right_answer:
-                right_answers_count += 1
 
-        through_defaults = {
-            'right_answers_count': right_answers_count,
-            'question_count': question.count(),
-        }
+@method_decorator(login_required, name='dispatch')
+class TestLeaderboardView(DetailView):
+    """
+    Best latest results of a test and the user place
+    """
+    model = Test
+    queryset = Test.objects.defer('search_vector')
+    template_name = 'leaderboard.html'
 
-        if test in self.request.user.tests.all():
-            self.request.user.tests.remove(test)
+    # Add  to context
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(object_list=object_list, **kwargs)
+        context.update({
+            'leaders': [
+                {'user': result.tests_user, 'score': result.score,
+                 'date': result.pass_date_time}
+                for result in test_leaderboard(self.object.id)
+            ],
+            'rank': test_rank(self.request.user.id, self.object.id),
+        })
+        return context
 
-        self.request.user.tests.add(test, through_defaults=through_defaults)
 
-        return HttpResponseRedirect(self.get_success_url())
+@method_decorator(login_required, name='dispatch')
+class LeaderboardView(TemplateView):
+    """
+    Users with the highest sum of test scores and the user place
+    """
+    template_name = 'leaderboard.html'
+
+    # Add  to context
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'leaders': [
+                {'user': entry.user, 'score': entry.total_score,
+                 'date': entry.updated_at}
+                for entry in global_leaderboard()
+            ],
+            'rank': global_rank(self.request.user.id),
+        })
+        return context
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class RequestStatsView(View):
+    """
+    Aggregated request metrics of this process, as JSON. Only for staff.
+    """
+
+    def get(self, request):
+        return JsonResponse({
+            'views': REQUEST_STATS.summary(),
+            'cache': cache_stats(),
+        })